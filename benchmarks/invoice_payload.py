@@ -0,0 +1,95 @@
+"""
+Per-invoice cost of the invoice parsers on a synthetic sheet.
+
+Run from the repository root (the config is read from ./config):
+
+    python benchmarks/invoice_payload.py --invoices 5000 --lines 8
+
+The sheet is built in memory, so only grouping and payload generation are
+timed, not Excel ingestion.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pandas as pd
+from parser.AR_Parser import ARInvoiceParser
+from parser.AP_Invoice import APInvoiceParser
+from parser.AR_Credit_Note import ARCreditNoteParser
+from parser.AP_Credit_Note import APCreditNoteParser
+
+PARSERS = {
+    "AR_Invoice": ARInvoiceParser,
+    "AP_Invoice": APInvoiceParser,
+    "AR_Credit Note": ARCreditNoteParser,
+    "AP_Credit Note": APCreditNoteParser,
+}
+
+SEGMENT_COLUMNS = [
+    "LEGAL_ENTITY", "BUSINESS_UNIT", "LOCATION", "INTERCOMPANY_CODE",
+    "MISCELLANEOUS1_CODE", "MISCELLANEOUS2_CODE", "MISCELLANEOUS3_CODE", "MISCELLANEOUS4_CODE",
+]
+HEADER_COLUMNS = [
+    "Transaction Source", "Transaction Type", "Order Reference Number", "Customer", "Supplier",
+    "Bill to", "Ship to", "Supplier Bank", "GRV number", "Notes", "Currency", "Payment Term",
+]
+DATE_COLUMNS = ["Invoice Date", "Accounting date", "Due Date", "GRV date"]
+LINE_COLUMNS = [
+    "Line", "Item", "Line Description", "Revenue Rule", "Expense Rule", "UOM", "Quantity",
+    "Unit Price", "Discount %", "Tax Rule", "Is tax overriden", "Tax over ridden amount",
+]
+
+
+def build_sheet(invoices, lines, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = invoices * lines
+    invoice_ids = np.repeat(np.arange(invoices), lines)
+    data = {
+        "LEGAL_ENTITY": rng.choice(["LE01", "LE02", "LE03"], invoices)[invoice_ids],
+        "Invoice Number": np.char.add("INV", invoice_ids.astype(str)),
+    }
+    for column in SEGMENT_COLUMNS[1:]:
+        data[column] = rng.choice(["S1", "S2", "S3", None], invoices)[invoice_ids]
+    for column in HEADER_COLUMNS:
+        data[column] = rng.choice(["value a", "value b", None], invoices)[invoice_ids]
+    dates = [f"{d:02d}/{m:02d}/2024" for d in range(1, 29) for m in range(1, 13)]
+    for column in DATE_COLUMNS:
+        data[column] = rng.choice(dates, invoices)[invoice_ids]
+    for column in LINE_COLUMNS:
+        data[column] = rng.choice(["1", "2.5", "text", None], rows)
+    data["Is tax overriden"] = rng.choice(["TRUE", "FALSE"], rows)
+
+    df = pd.DataFrame(data, dtype=str)
+    df["row_number"] = df.index
+    return df
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--invoices", type=int, default=5000)
+    arg_parser.add_argument("--lines", type=int, default=8)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    logging.getLogger("CFLLogger").setLevel(logging.ERROR)
+    df = build_sheet(args.invoices, args.lines)
+
+    print(f"{args.invoices} invoices x {args.lines} lines, best of {args.repeat}")
+    for sheet, parser_class in PARSERS.items():
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            payloads = parser_class(df.copy()).parse()
+            best = min(best, time.perf_counter() - start)
+        print(f"  {sheet:<15} {best:7.2f}s  {best / len(payloads) * 1e6:8.1f} us/invoice")
+
+
+if __name__ == "__main__":
+    main()
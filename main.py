@@ -1,33 +1,45 @@
 import os
 import glob
-import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from utils.config_loader import load_config
-from parser.AR_Parser import ARInvoiceParser
-from parser.AP_Invoice import APInvoiceParser
-from parser.AP_Credit_Note import APCreditNoteParser
-from parser.AR_Credit_Note import ARCreditNoteParser
 from utils.logger import get_logger
-from parser.Masters_Party import MasterPartyParser
-from parser.LE_Party import LEPartyParser
 from parser.base_parser import BaseParser
-import pandas as pd
+from parser.registry import PARSER_MAP
+from parser.external_grouping import ExternalGrouper
+from parser.parallel import DEFAULT_CHUNK_INVOICES, configure_generation
+from utils.excel_reader import (
+    DEFAULT_CHUNK_SIZE, compact_frame, get_sheet_names, iter_sheet_chunks, iter_group_aligned_chunks
+)
+from utils.output_writer import COMPRESSIONS, OUTPUT_FORMATS, check_compression, open_writer, shard_index_path
+from utils.staging import SheetCache, file_hash
+from utils import json_io
+from utils.uuid_provider import UUID_MODES, configure_uuids, configured_uuid_mode
+from utils.snapshot import DocumentDiff
+from utils.location_store import configure_locations
+from utils.manifest import (
+    GENERATOR_VERSION, SHEET_FIELDS, WORKBOOK_FIELDS, RunManifest, SheetHasher,
+    config_hash, is_up_to_date, sheet_hash
+)
+from utils.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
 
 config = load_config()
 logger = get_logger()
 
-PARSER_MAP = {
-    "AR_Invoice": ARInvoiceParser,
-    "AR_Credit Note": ARCreditNoteParser,
-    "AP_Invoice": APInvoiceParser,
-    "AP_Credit Note": APCreditNoteParser,
-    "Masters_Party": MasterPartyParser,
-    "LE_Party": LEPartyParser
-}
-
 def detect_parser_by_sheet(sheet_name):
-    for keyword, parser_class in PARSER_MAP.items():
+    # looks up only the matching keyword, so only that parser gets imported
+    keyword = detect_document_type(sheet_name)
+    return PARSER_MAP[keyword] if keyword else None
+
+
+def detect_document_type(sheet_name):
+    """The PARSER_MAP keyword of a sheet, e.g. "AR_Invoice" for "AR_Invoice (2)"."""
+    for keyword in PARSER_MAP:
         if keyword in sheet_name:
-            return parser_class
+            return keyword
     return None
 
 
@@ -38,13 +50,328 @@ def detect_parser(file_path) -> BaseParser | ValueError:
     else:
         raise ValueError(f"No parser defined for: {file_path}")
 
-def main():
-    input_dir = config["paths"]["input_dir"]
-    output_dir = config["paths"]["output_dir"]
+def parse_args(argv=None):
+    streaming = config.get("streaming", {})
+    arg_parser = argparse.ArgumentParser(description="Generate migration payloads from Excel templates.")
+    arg_parser.add_argument(
+        "--stream", action="store_true", default=streaming.get("enabled", False),
+        help="Read sheets in bounded-size chunks instead of loading them whole. Invoices may come out in a "
+             "different order, and the lines of an invoice must be contiguous in the sheet: each separate "
+             "run of its lines is written as a payload of its own"
+    )
+    arg_parser.add_argument(
+        "--chunk-size", type=int, default=streaming.get("chunk_size", DEFAULT_CHUNK_SIZE),
+        help="Rows per chunk in streaming mode"
+    )
+    arg_parser.add_argument(
+        "--workers", type=int, default=config.get("parallel", {}).get("workers", 1),
+        help="Number of processes used to handle (file, sheet) units in parallel"
+    )
+    arg_parser.add_argument(
+        "--generate-workers", type=int, default=config.get("parallel", {}).get("generate_workers", 1),
+        help="Number of processes generating the invoice payloads of one sheet"
+    )
+    arg_parser.add_argument(
+        "--generate-chunk", type=int,
+        default=config.get("parallel", {}).get("generate_chunk", DEFAULT_CHUNK_INVOICES),
+        help="Invoices per task handed to a generating process"
+    )
+    arg_parser.add_argument(
+        "--compact", action="store_true", default=config.get("ingest", {}).get("compact", False),
+        help="Store text columns with few distinct values as categoricals for parsing (chunk by chunk with "
+             "--stream or --global-grouping), to cut memory on large sheets"
+    )
+    arg_parser.add_argument(
+        "--no-cache", dest="cache", action="store_false", default=config.get("staging", {}).get("enabled", True),
+        help="Always read sheets from the workbook instead of the staging cache"
+    )
+    arg_parser.add_argument(
+        "--format", dest="output_format", choices=sorted(OUTPUT_FORMATS),
+        default=config.get("output", {}).get("format", "json"),
+        help="json writes one array per sheet, jsonl one payload per line"
+    )
+    arg_parser.add_argument(
+        "--shards", type=int, default=config.get("output", {}).get("shards", 1),
+        help="Split each sheet's output into this many files by legal entity (invoices) or party, plus an index"
+    )
+    arg_parser.add_argument(
+        "--compress", dest="compression", choices=list(COMPRESSIONS),
+        default=config.get("output", {}).get("compression", "none"),
+        help="Compress output files as they are written (zstd needs the zstandard package)"
+    )
+    arg_parser.add_argument(
+        "--no-offset-index", dest="offset_index", action="store_false",
+        default=config.get("output", {}).get("offset_index", True),
+        help="Do not write the .idx sidecar of byte offsets next to each output file"
+    )
+    arg_parser.add_argument(
+        "--pretty", action="store_true", default=config.get("output", {}).get("pretty", False),
+        help="Indent JSON output for reading (json format only, larger and slower to write)"
+    )
+    arg_parser.add_argument(
+        "--uuid-mode", choices=UUID_MODES, default=configured_uuid_mode(),
+        help="random and bulk write fresh uuid4 values, deterministic derives them from the document type, "
+             "legal entity and invoice number. Without --global-grouping, an invoice that appears in "
+             "several workbooks or tabs gets the same UUIDs in each of their outputs"
+    )
+    grouping = config.get("grouping", {})
+    arg_parser.add_argument(
+        "--global-grouping", action="store_true", default=grouping.get("global", False),
+        help="Group invoice lines by legal entity and invoice number across all workbooks and tabs "
+             "of a document type, writing one output per type"
+    )
+    arg_parser.add_argument(
+        "--memory-mb", type=int, default=grouping.get("memory_mb", 512),
+        help="Memory budget in MB for the rows global grouping buffers before spilling a sorted run to disk"
+    )
+    arg_parser.add_argument(
+        "--diff", action="store_true", default=config.get("output", {}).get("diff", False),
+        help="Write only the documents added or changed since the previous run, "
+             "and list the removed ones in <output>.removed.json"
+    )
+    locations = config.get("locations", {})
+    arg_parser.add_argument(
+        "--offline-locations", action="store_true", default=locations.get("offline", False),
+        help="Resolve countries, states and cities from the local location store only, never the service"
+    )
+    arg_parser.add_argument(
+        "--refresh-locations-days", type=float, default=locations.get("refresh_after_days", 30),
+        help="Fetch stored locations again from the service once older than this many days"
+    )
+    arg_parser.add_argument(
+        "--force", action="store_true",
+        help="Regenerate every output even if the manifest says it is up to date"
+    )
+    args = arg_parser.parse_args(argv)
+    try:
+        check_compression(args.compression)
+    except ValueError as e:
+        arg_parser.error(str(e))
+    if args.generate_chunk < 1:
+        arg_parser.error("--generate-chunk must be at least 1")
+    return args
 
-    os.makedirs(output_dir, exist_ok=True)
 
-    for file_name in os.listdir(input_dir):
+def get_sheet_cache(args):
+    if not args.cache:
+        return None
+    return SheetCache(config["paths"].get("staging_dir", "data/staging"))
+
+
+_open_workbooks = {}
+
+def open_workbook(file_path):
+    """Open a workbook once per process and reuse it for its other sheets."""
+    if file_path not in _open_workbooks:
+        for xl in _open_workbooks.values():
+            xl.close()
+        _open_workbooks.clear()
+        _open_workbooks[file_path] = pd.ExcelFile(file_path, engine="openpyxl")
+    return _open_workbooks[file_path]
+
+
+def read_sheet(file_path, sheet_name):
+    df = open_workbook(file_path).parse(sheet_name, dtype=str)
+    df['row_number'] = df.index    # for indexing the row number of the entry 
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def writer_options(args):
+    return {"shards": args.shards, "compression": args.compression, "offset_index": args.offset_index}
+
+
+def open_sheet_writer(output_file, output_format, parser_class, options=None):
+    return open_writer(
+        output_file, output_format, shard_key=parser_class.shard_key, index_fields=parser_class.index_fields,
+        **(options or {})
+    )
+
+
+def open_diff(output_file, parser_class, args):
+    """The DocumentDiff of a diff run, None otherwise or when the parser has no document key."""
+    if not args.diff or not parser_class.document_key:
+        return None
+    return DocumentDiff(output_file, parser_class.document_key)
+
+
+def diffed(records, diff=None):
+    return diff.filter(records) if diff else records
+
+
+def process_sheet(file_path, sheet_name, parser_class, output_file, output_format, fingerprint, previous=None, cache=None, writer_options=None, compact=False, diff=None):
+    if cache:
+        df = cache.load(file_path, sheet_name, read_sheet)
+    else:
+        df = read_sheet(file_path, sheet_name)
+    if compact:
+        df = compact_frame(df)
+
+    if df.empty:
+        logger.warning(f"Skipping empty sheet: {sheet_name}")
+        return "empty"
+
+    fingerprint["sheet_hash"] = sheet_hash(df)
+    if is_up_to_date(previous, output_file, fingerprint, SHEET_FIELDS):
+        return "unchanged"
+
+    parser = parser_class(df)
+
+    with open_sheet_writer(output_file, output_format, parser_class, writer_options) as writer:
+        writer.write_all(diffed(parser.iter_parse(), diff))
+    return "saved"
+
+
+def read_sheet_chunks(file_path, sheet_name, chunk_size, cache=None, compact=False):
+    if cache:
+        chunks = cache.iter_chunks(file_path, sheet_name, chunk_size, iter_sheet_chunks)
+    else:
+        chunks = iter_sheet_chunks(file_path, sheet_name, chunk_size)
+    if compact:
+        return (compact_frame(chunk) for chunk in chunks)
+    return chunks
+
+
+def process_sheet_streaming(file_path, sheet_name, parser_class, output_file, output_format, chunk_size, fingerprint, previous=None, cache=None, writer_options=None, compact=False, diff=None):
+    def read_chunks():
+        return read_sheet_chunks(file_path, sheet_name, chunk_size, cache, compact)
+
+    def hashed(chunks):
+        for chunk in chunks:
+            hasher.update(chunk)
+            yield chunk
+
+    hasher = SheetHasher()
+    if previous and previous.get("sheet_hash"):
+        # Only worth a separate hashing pass if the output might be reusable
+        for chunk in hashed(read_chunks()):
+            pass
+        fingerprint["sheet_hash"] = hasher.hexdigest()
+        if is_up_to_date(previous, output_file, fingerprint, SHEET_FIELDS):
+            return "unchanged"
+        chunks = read_chunks()
+    else:
+        chunks = hashed(read_chunks())
+
+    if parser_class.group_keys:
+        chunks = iter_group_aligned_chunks(chunks, parser_class.group_keys)
+
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+        logger.warning(f"Skipping empty sheet: {sheet_name}")
+        return "empty"
+
+    with open_sheet_writer(output_file, output_format, parser_class, writer_options) as writer:
+        writer.write_all(diffed(parser_class(first_chunk).iter_parse(), diff))
+        for chunk in chunks:
+            writer.write_all(diffed(parser_class(chunk).iter_parse(), diff))
+
+    if "sheet_hash" not in fingerprint:
+        fingerprint["sheet_hash"] = hasher.hexdigest()
+    return "saved"
+
+
+def get_output_file(output_dir, file_path, sheet_name, output_format="json", shards=1, compression="none"):
+    """Path of the sheet's output, or of its shard index when the output is sharded."""
+    extension, _ = OUTPUT_FORMATS[output_format]
+    output_file = os.path.join(
+        output_dir,
+        f"{os.path.splitext(os.path.basename(file_path))[0]}_{sheet_name}{extension}{COMPRESSIONS[compression]}"
+    )
+    return shard_index_path(output_file) if shards > 1 else output_file
+
+
+def run_unit(file_path, sheet_name, output_file, args, fingerprint, previous=None):
+    """
+    Process one (file, sheet) unit. Returns the status, the completed
+    fingerprint and, on failure, the error message so that one bad sheet
+    does not abort the rest of the workbook.
+    """
+    logger.info(f"Processing sheet: {sheet_name}")
+    try:
+        parser_class = detect_parser_by_sheet(sheet_name)
+        configure_uuids(args.uuid_mode)
+        configure_generation(args.generate_workers, args.generate_chunk)
+        configure_locations(args.offline_locations, args.refresh_locations_days)
+        json_io.set_pretty(args.pretty)
+        cache = get_sheet_cache(args)
+        diff = open_diff(output_file, parser_class, args)
+        if args.stream:
+            status = process_sheet_streaming(
+                file_path, sheet_name, parser_class, output_file, args.output_format, args.chunk_size,
+                fingerprint, previous, cache, writer_options(args), args.compact, diff
+            )
+        else:
+            status = process_sheet(
+                file_path, sheet_name, parser_class, output_file, args.output_format, fingerprint, previous, cache,
+                writer_options(args), args.compact, diff
+            )
+
+        if status == "saved":
+            if diff:
+                diff.save()
+            logger.info(f"Saved payload to: {output_file}")
+        elif status == "unchanged":
+            logger.info(f"Sheet unchanged, keeping: {output_file}")
+        return status, fingerprint, None
+
+    except Exception as e:
+        logger.error(f"Failed processing sheet {sheet_name} of {file_path}: {str(e)}")
+        return "failed", fingerprint, str(e)
+
+
+def get_group_output_file(output_dir, document_type, output_format="json", shards=1, compression="none"):
+    """Output of a document type grouped across workbooks, e.g. Grouped_AR_Invoice.json."""
+    extension, _ = OUTPUT_FORMATS[output_format]
+    output_file = os.path.join(output_dir, f"Grouped_{document_type}{extension}{COMPRESSIONS[compression]}")
+    return shard_index_path(output_file) if shards > 1 else output_file
+
+
+def run_group(sources, document_type, output_file, args, fingerprint, previous=None):
+    """
+    Process all (file, sheet) `sources` of one document type as one unit.
+    Their rows go through an ExternalGrouper, so the lines of an invoice
+    that are split across workbooks or continuation tabs end up in a single
+    payload while memory stays within --memory-mb.
+    """
+    logger.info(f"Grouping {document_type} across {len(sources)} sheet(s)")
+    try:
+        parser_class = PARSER_MAP[document_type]
+        configure_uuids(args.uuid_mode)
+        configure_generation(args.generate_workers, args.generate_chunk)
+        configure_locations(args.offline_locations, args.refresh_locations_days)
+        json_io.set_pretty(args.pretty)
+        cache = get_sheet_cache(args)
+        spill_dir = config.get("grouping", {}).get("spill_dir")
+        diff = open_diff(output_file, parser_class, args)
+
+        with ExternalGrouper(parser_class.group_keys, args.memory_mb * 1024 * 1024, spill_dir) as grouper:
+            for file_path, sheet_name in sources:
+                for chunk in read_sheet_chunks(file_path, sheet_name, args.chunk_size, cache, args.compact):
+                    grouper.add(chunk)
+            if grouper.rows == 0:
+                logger.warning(f"Skipping {document_type}: no rows in {len(sources)} sheet(s)")
+                return "empty", fingerprint, None
+
+            with open_sheet_writer(output_file, args.output_format, parser_class, writer_options(args)) as writer:
+                for chunk in grouper.iter_chunks():
+                    writer.write_all(diffed(parser_class(chunk).iter_parse(), diff))
+
+        if diff:
+            diff.save()
+        logger.info(f"Saved payload to: {output_file}")
+        return "saved", fingerprint, None
+
+    except Exception as e:
+        logger.error(f"Failed grouping {document_type}: {str(e)}")
+        return "failed", fingerprint, str(e)
+
+
+def collect_units(input_dir, cache=None):
+    units = []
+    failures = []
+
+    for file_name in sorted(os.listdir(input_dir)):
         if not file_name.endswith(".xlsx"):
             continue
 
@@ -53,40 +380,145 @@ def main():
 
         try:
             # Get sheet names first
-            xl = pd.ExcelFile(file_path, engine="openpyxl")
-            sheet_names = xl.sheet_names
+            if cache:
+                sheet_names = cache.sheet_names(file_path, get_sheet_names)
+            else:
+                sheet_names = get_sheet_names(file_path)
+        except Exception as e:
+            logger.error(f"Failed processing {file_path}: {str(e)}")
+            failures.append((file_path, None, str(e)))
+            continue
 
-            for sheet_name in sheet_names:
-                logger.info(f"Processing sheet: {sheet_name}")
-                parser_class = detect_parser_by_sheet(sheet_name)
+        for sheet_name in sheet_names:
+            if not detect_document_type(sheet_name):
+                logger.warning(f"No parser found for sheet: {sheet_name}")
+                continue
+            units.append((file_path, sheet_name))
 
-                if not parser_class:
-                    logger.warning(f"No parser found for sheet: {sheet_name}")
-                    continue
+    return units, failures
 
-                df = xl.parse(sheet_name, dtype=str)
-                if df.empty:
-                    logger.warning(f"Skipping empty sheet: {sheet_name}")
-                    continue
 
-                df['row_number'] = df.index    # for indexing the row number of the entry 
-                df.columns = df.columns.str.strip()
+def main(argv=None):
+    args = parse_args(argv)
+    json_io.set_pretty(args.pretty)
+    input_dir = config["paths"]["input_dir"]
+    output_dir = config["paths"]["output_dir"]
 
-                parser = parser_class(df)
-                parsed_data = parser.parse()
+    os.makedirs(output_dir, exist_ok=True)
 
-                output_file = os.path.join(
-                    output_dir,
-                    f"{os.path.splitext(file_name)[0]}_{sheet_name}.json"
-                )
+    units, failures = collect_units(input_dir, get_sheet_cache(args))
+    manifest = RunManifest(os.path.join(output_dir, "manifest.json"))
+    settings_hash = config_hash(config)
 
-                with open(output_file, "w") as f:
-                    json.dump(parsed_data, f, indent=2)
-                logger.info(f"Saved payload to: {output_file}")
+    options = {
+        "stream": args.stream, "format": args.output_format, "uuid_mode": args.uuid_mode, "pretty": args.pretty,
+        "shards": args.shards, "compression": args.compression, "offset_index": args.offset_index,
+        "diff": args.diff,
+    }
 
+    groups = {}
+    if args.global_grouping:
+        sheet_units = []
+        for file_path, sheet_name in units:
+            document_type = detect_document_type(sheet_name)
+            if PARSER_MAP[document_type].group_keys:
+                groups.setdefault(document_type, []).append((file_path, sheet_name))
+            else:
+                sheet_units.append((file_path, sheet_name))
+        units = sheet_units
 
-        except Exception as e:
-            logger.error(f"Failed processing {file_path}: {str(e)}")
+    # (task, source, sheet or document type, output file, fingerprint, previous manifest entry)
+    pending = []
+    skipped = 0
+    for file_path, sheet_name in units:
+        output_file = get_output_file(
+            output_dir, file_path, sheet_name, args.output_format, args.shards, args.compression
+        )
+        fingerprint = {
+            "workbook": os.path.basename(file_path),
+            "sheet": sheet_name,
+            "workbook_hash": file_hash(file_path),
+            "generator_version": GENERATOR_VERSION,
+            "config_hash": settings_hash,
+            "options": options,
+        }
+        # Diff runs never keep an output as it is: it holds the previous delta,
+        # while an unchanged sheet must now produce an empty one
+        previous = None if args.force or args.diff else manifest.get(output_file)
+        if is_up_to_date(previous, output_file, fingerprint, WORKBOOK_FIELDS):
+            logger.info(f"Workbook unchanged, keeping: {output_file}")
+            skipped += 1
+            continue
+        pending.append((run_unit, file_path, sheet_name, output_file, fingerprint, previous))
+
+    for document_type, sources in groups.items():
+        output_file = get_group_output_file(
+            output_dir, document_type, args.output_format, args.shards, args.compression
+        )
+        sources_hash = hashlib.sha256()
+        for file_path, sheet_name in sources:
+            sources_hash.update(f"{file_hash(file_path)}\0{sheet_name}\0".encode())
+        fingerprint = {
+            "workbook": [os.path.basename(file_path) for file_path, _ in sources],
+            "sheet": [sheet_name for _, sheet_name in sources],
+            "workbook_hash": sources_hash.hexdigest(),
+            "generator_version": GENERATOR_VERSION,
+            "config_hash": settings_hash,
+            "options": dict(options, global_grouping=True),
+        }
+        previous = None if args.force or args.diff else manifest.get(output_file)
+        if is_up_to_date(previous, output_file, fingerprint, WORKBOOK_FIELDS):
+            logger.info(f"Workbooks unchanged, keeping: {output_file}")
+            skipped += 1
+            continue
+        pending.append((run_group, sources, document_type, output_file, fingerprint, previous))
+
+    def describe(source):
+        if isinstance(source, list):
+            return ", ".join(f"{os.path.basename(file_path)}:{sheet_name}" for file_path, sheet_name in source)
+        return source
+
+    def handle_result(file_path, sheet_name, output_file, status, fingerprint, error):
+        nonlocal skipped
+        if error:
+            failures.append((describe(file_path), sheet_name, error))
+            return
+        if status == "unchanged":
+            skipped += 1
+        if status in ("saved", "unchanged"):
+            manifest.record(output_file, fingerprint, regenerated=(status == "saved"))
+            manifest.save()
+
+    if args.workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = {
+                pool.submit(task, file_path, sheet_name, output_file, args, fingerprint, previous):
+                    (file_path, sheet_name, output_file)
+                for task, file_path, sheet_name, output_file, fingerprint, previous in pending
+            }
+            for future in as_completed(futures):
+                file_path, sheet_name, output_file = futures[future]
+                try:
+                    status, fingerprint, error = future.result()
+                except Exception as e:
+                    # the worker itself died, e.g. killed for running out of memory
+                    status, fingerprint, error = "failed", None, str(e)
+                handle_result(file_path, sheet_name, output_file, status, fingerprint, error)
+    else:
+        for task, file_path, sheet_name, output_file, fingerprint, previous in pending:
+            status, fingerprint, error = task(file_path, sheet_name, output_file, args, fingerprint, previous)
+            handle_result(file_path, sheet_name, output_file, status, fingerprint, error)
+
+    if skipped:
+        logger.info(f"{skipped} sheet(s) unchanged since the last run")
+    if failures:
+        logger.error(f"{len(failures)} unit(s) failed:")
+        for file_path, sheet_name, error in failures:
+            logger.error(f"  {file_path} [{sheet_name or '-'}]: {error}")
+    else:
+        logger.info(f"Processed {len(units)} sheet(s) successfully")
+
+    return failures
 
 
 if __name__ == "__main__":
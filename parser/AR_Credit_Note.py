@@ -1,19 +1,29 @@
 from parser.base_parser import BaseParser
+from parser.documents import InvoiceBatch
+from parser.dates import add_epoch_columns
+from parser.normalize import normalize_blanks
+from parser.parallel import iter_generate
 from payload.AR_Credit_Note import ARCreditNote
 
 class ARCreditNoteParser(BaseParser):
+    group_keys = ["LEGAL_ENTITY", "Invoice Number"]
+    shard_key = "legal_entity"
+    index_fields = ("legal_entity", "invoice_number", "row_number")
+    document_key = ("legal_entity", "invoice_number")
+    date_columns = ["Invoice Date", "Accounting date", "Due Date"]
+
     def __init__(self, dataframe):
         self.df = dataframe
 
-    def parse(self):
+    def iter_parse(self):
         if self.df.empty:
             raise ValueError("Sheet is empty.")
         
-        df = self.df
+        df = add_epoch_columns(normalize_blanks(self.df), self.date_columns)
         
-        grouped = df.groupby(["LEGAL_ENTITY", "Invoice Number"]).agg(list).reset_index()
-        data = grouped.to_dict(orient="records")
         ARCreditNotePayloadGen = ARCreditNote()
-        payload = ARCreditNotePayloadGen.generate(data)
+        header_columns, line_columns = ARCreditNotePayloadGen.columns()
+        data = InvoiceBatch(df, self.group_keys, header_columns, line_columns)
+        payload = iter_generate(ARCreditNotePayloadGen, data)
 
         return payload
\ No newline at end of file
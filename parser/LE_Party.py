@@ -1,20 +1,26 @@
-from parser.base_parser import BaseParser
+from parser.base_parser import BaseParser, iter_records
+from parser.locations import enrich_le_party
+from parser.normalize import normalize_blanks
 from payload.LEParty import LEPartyPayload
 
 class LEPartyParser(BaseParser):
+    shard_key = "masterParty"
+    index_fields = ("masterParty", "row_number")
+    document_key = ("masterParty",)
+
     def __init__(self, dataframe):
         self.df = dataframe
 
-    def parse(self):
+    def iter_parse(self):
         if self.df.empty:
             raise ValueError("Sheet is empty.")
         
-        df = self.df
+        df = enrich_le_party(normalize_blanks(self.df))
         
-        data = df.to_dict(orient="records")
+        data = iter_records(df)
         
         payload_gen = LEPartyPayload()
         
-        payload = payload_gen.generate(data)
+        payload = payload_gen.iter_generate(data)
         
         return payload
\ No newline at end of file
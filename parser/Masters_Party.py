@@ -1,20 +1,26 @@
-from parser.base_parser import BaseParser
+from parser.base_parser import BaseParser, iter_records
+from parser.locations import enrich_master_party
+from parser.normalize import normalize_blanks
 from payload.Masters_Party import MasterPartyPayload
 
 class MasterPartyParser(BaseParser):
+    shard_key = "dunsNumber"
+    index_fields = ("dunsNumber", "masterPartyName", "row_number")
+    document_key = ("dunsNumber", "masterPartyName")
+
     def __init__(self, dataframe):
         self.df = dataframe
 
-    def parse(self):
+    def iter_parse(self):
         if self.df.empty:
             raise ValueError("Sheet is empty.")
         
-        df = self.df
+        df = enrich_master_party(normalize_blanks(self.df))
         
-        data = df.to_dict(orient="records")
+        data = iter_records(df)
         
         payload_gen = MasterPartyPayload()
         
-        payload = payload_gen.generate(data)
+        payload = payload_gen.iter_generate(data)
         
         return payload
\ No newline at end of file
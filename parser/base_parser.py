@@ -1,8 +1,28 @@
-import pandas as pd
+
+def iter_records(df):
+    """Lazy equivalent of `df.to_dict(orient="records")`."""
+    columns = list(df.columns)
+    values = [df[column].to_numpy(dtype=object) for column in columns]
+    for row in zip(*values):
+        yield dict(zip(columns, row))
+
 
 class BaseParser:
+    # Columns identifying one document; rows sharing them must be parsed together
+    group_keys = None
+    # Field of the output records that partitions sharded output
+    shard_key = None
+    # Fields of the output records the offset index can look records up by
+    index_fields = ("row_number",)
+    # Fields of the output records identifying a document from one run to the next
+    document_key = None
+
     def __init__(self, file_path):
         self.file_path = file_path
         
     def parse(self):
-        raise NotImplementedError("Subclasses must implement the parse method.")
+        return list(self.iter_parse())
+
+    def iter_parse(self):
+        """Return an iterator over the payload records of the sheet."""
+        raise NotImplementedError("Subclasses must implement the iter_parse method.")
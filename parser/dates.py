@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.0
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+EPOCH_SUFFIX = " (epoch)"
+
+# Date strings already converted, shared by all sheets and chunks of a run
+_MEMO_LIMIT = 100_000
+_epoch_memo = {}
+
+
+def epoch_column(column):
+    """Name of the column holding the precomputed epoch strings of `column`."""
+    return column + EPOCH_SUFFIX
+
+
+def _convert(values):
+    """
+    Convert distinct date strings to epoch millisecond strings.
+
+    `pd.to_datetime(value, dayfirst=True)` on a scalar guesses the format of
+    that one value and parses with it. Bucketing the values by their guessed
+    format and parsing every bucket in one call gives the same result
+    without re-inferring the format per value.
+    """
+    by_format = {}
+    for value in values:
+        by_format.setdefault(guess_datetime_format(value, dayfirst=True), []).append(value)
+
+    converted = {}
+    for date_format, bucket in by_format.items():
+        try:
+            if date_format is None:
+                stamps = pd.to_datetime(bucket, dayfirst=True)
+            else:
+                stamps = pd.to_datetime(bucket, format=date_format)
+        except (ValueError, TypeError):
+            # e.g. mixed time zones in one bucket, parse those one by one
+            stamps = [pd.to_datetime(value, dayfirst=True) for value in bucket]
+
+        for value, stamp in zip(bucket, stamps):
+            # whitespace and similar non-dates parse to NaT, treat them as blank
+            converted[value] = None if pd.isna(stamp) else str(int(stamp.timestamp() * 1000))  # milliseconds
+    return converted
+
+
+def to_epoch_strings(values):
+    """
+    Return an object array with the epoch millisecond string of every date
+    (parsed day first), or None where the cell is blank.
+    Each distinct value is parsed only once.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = [str(u) for u in uniques]
+
+    missing = [u for u in uniques if u not in _epoch_memo]
+    if missing:
+        if len(_epoch_memo) + len(missing) > _MEMO_LIMIT:
+            _epoch_memo.clear()
+        _epoch_memo.update(_convert(missing))
+
+    # code -1 marks a missing cell and picks the trailing None
+    lookup = np.array([_epoch_memo[u] for u in uniques] + [None], dtype=object)
+    return lookup[codes]
+
+
+def add_epoch_columns(df, columns):
+    """Return `df` with an epoch column added for every date column it has."""
+    # object dtype keeps None for blanks, pandas >= 3 would infer str with NaN for them
+    epochs = {
+        epoch_column(column): pd.Series(to_epoch_strings(df[column]), index=df.index, dtype=object)
+        for column in columns if column in df.columns
+    }
+    return df.assign(**epochs) if epochs else df
@@ -0,0 +1,101 @@
+from collections.abc import Sequence
+import pandas as pd
+from parser.grouping import GroupedRows, take_values
+
+
+def _column_array(series, rows):
+    """Numeric columns keep their dtype (row_number stays int64), text columns become object arrays."""
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        return series.to_numpy()[rows]
+    return take_values(series, rows)
+
+
+class InvoiceDocument:
+    """View of invoice `index` of an InvoiceBatch."""
+
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    def __repr__(self):
+        return f"InvoiceDocument({self.key!r}, lines={self.line_count})"
+
+    @property
+    def key(self):
+        return tuple(self.batch.header[k][self.index] for k in self.batch.keys)
+
+    @property
+    def line_count(self):
+        return int(self.batch.stops[self.index] - self.batch.starts[self.index])
+
+    def header(self, column, default=None):
+        values = self.batch.header.get(column)
+        return default if values is None else values[self.index]
+
+    def lines(self, column):
+        """Values of a line column for this invoice, a slice of the batch array."""
+        values = self.batch.lines.get(column)
+        if values is None:
+            return None
+        return values[self.batch.starts[self.index]:self.batch.stops[self.index]]
+
+
+class InvoiceBatch(Sequence):
+    """
+    Invoices of one sheet grouped by `keys`, in `df.groupby(keys)` order.
+
+    Header fields are stored once per invoice: `header[column][i]` is the
+    value on the first line of invoice i. Line fields are column arrays
+    with the lines of invoice i at `lines[column][starts[i]:stops[i]]`.
+    Only the requested columns are kept.
+    """
+
+    def __init__(self, df, keys, header_columns, line_columns):
+        self.keys = list(keys)
+        grouped = GroupedRows(df[self.keys], self.keys)
+        self.starts = grouped.starts
+        self.stops = grouped.stops
+
+        first_rows = grouped.order[grouped.starts]
+        self.header = dict(grouped.key_values)
+        for column in header_columns:
+            if column in df.columns and column not in self.header:
+                self.header[column] = _column_array(df[column], first_rows)
+        self.lines = {
+            column: _column_array(df[column], grouped.order)
+            for column in dict.fromkeys(line_columns) if column in df.columns
+        }
+
+    def sub_batch(self, start, stop):
+        """
+        Invoices start..stop-1 as a batch of their own. Its arrays are slices
+        of this batch's, so pickling it (e.g. to a worker process) copies only
+        the rows of those invoices.
+        """
+        part = InvoiceBatch.__new__(InvoiceBatch)
+        part.keys = self.keys
+        first = self.starts[start] if stop > start else 0
+        last = self.stops[stop - 1] if stop > start else 0
+        part.starts = self.starts[start:stop] - first
+        part.stops = self.stops[start:stop] - first
+        part.header = {column: values[start:stop] for column, values in self.header.items()}
+        part.lines = {column: values[first:last] for column, values in self.lines.items()}
+        return part
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [InvoiceDocument(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("invoice index out of range")
+        return InvoiceDocument(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield InvoiceDocument(self, i)
@@ -0,0 +1,158 @@
+import os
+import pickle
+import shutil
+import tempfile
+from parser.normalize import normalize_blanks
+from utils.lazy_import import lazy_import
+from utils.logger import get_logger
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+logger = get_logger()
+
+SEQUENCE_COLUMN = "_seq"
+DEFAULT_PIECE_ROWS = 5000
+
+
+def _less_than(frame, keys, bound):
+    """Rows of `frame` whose key tuple sorts before `bound`."""
+    less = np.zeros(len(frame), dtype=bool)
+    equal = np.ones(len(frame), dtype=bool)
+    for key, value in zip(keys, bound):
+        column = frame[key].to_numpy(dtype=object)
+        less |= equal & (column < value)
+        equal &= column == value
+    return less
+
+
+class ExternalGrouper:
+    """
+    Group rows by `keys` across any number of sheets within a memory budget.
+
+    Chunks passed to add() are buffered until they take `memory_bytes`, then
+    sorted by key (rows of one key stay in the order they were added) and
+    spilled to a run file. iter_chunks() merges the runs and yields frames
+    sorted by key in which every group is complete, so each can be handed to
+    a parser on its own. Rows with a blank key are dropped, as the parsers do.
+
+    Memory during the merge is about one `piece_rows` piece per run plus the
+    largest group.
+    """
+
+    def __init__(self, keys, memory_bytes, spill_dir=None, piece_rows=DEFAULT_PIECE_ROWS):
+        self.keys = list(keys)
+        self.memory_bytes = memory_bytes
+        self.piece_rows = piece_rows
+        self.rows = 0
+        self.dropped = 0
+        self._spill_root = spill_dir
+        self._spill_dir = None
+        self._runs = []
+        self._buffer = []
+        self._buffer_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+        self._runs = []
+        self._buffer = []
+
+    def add(self, chunk):
+        # Keys are stored as objects: categorical ones (see --compact) would sort
+        # by category order, while the merge compares key values.
+        keys = normalize_blanks(chunk[self.keys]).astype(object)
+        complete = (keys != "").all(axis=1).to_numpy()
+        chunk = chunk.assign(**{key: keys[key] for key in self.keys})[complete]
+        self.dropped += int((~complete).sum())
+        if chunk.empty:
+            return
+        chunk = chunk.assign(**{SEQUENCE_COLUMN: np.arange(self.rows, self.rows + len(chunk), dtype=np.int64)})
+        self.rows += len(chunk)
+
+        self._buffer.append(chunk)
+        self._buffer_bytes += int(chunk.memory_usage(index=False, deep=True).sum())
+        if self._buffer_bytes >= self.memory_bytes:
+            self._spill()
+
+    def _sorted_buffer(self):
+        frame = pd.concat(self._buffer, ignore_index=True)
+        self._buffer = []
+        self._buffer_bytes = 0
+        return frame.sort_values(self.keys + [SEQUENCE_COLUMN], kind="stable", ignore_index=True)
+
+    def _spill(self):
+        if self._spill_dir is None:
+            if self._spill_root:
+                os.makedirs(self._spill_root, exist_ok=True)
+            self._spill_dir = tempfile.mkdtemp(prefix="grouping-", dir=self._spill_root)
+        frame = self._sorted_buffer()
+        path = os.path.join(self._spill_dir, f"run{len(self._runs):05d}.pkl")
+        with open(path, "wb") as f:
+            for start in range(0, len(frame), self.piece_rows):
+                pickle.dump(frame.iloc[start:start + self.piece_rows], f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._runs.append(path)
+        logger.debug(f"Spilled run {len(self._runs)} of {len(frame)} rows to {path}")
+
+    @staticmethod
+    def _read_run(path):
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def _finish(self, frame):
+        return frame.sort_values(self.keys + [SEQUENCE_COLUMN], kind="stable", ignore_index=True)
+
+    def iter_chunks(self):
+        """Yield key-sorted frames, each holding only complete groups."""
+        if self.dropped:
+            logger.warning(f"Dropped {self.dropped} rows with a blank {' / '.join(self.keys)}")
+        if not self._runs:
+            if self._buffer:
+                yield self._sorted_buffer()
+            return
+        if self._buffer:
+            self._spill()
+        logger.info(f"Merging {len(self._runs)} sorted runs of {self.rows} rows")
+
+        readers = [self._read_run(path) for path in self._runs]
+        pending = [next(reader) for reader in readers]
+        live = set(range(len(readers)))
+
+        while live:
+            # Everything before the smallest last key of a run that still has
+            # pieces to read is complete: later pieces only hold larger keys.
+            bound = min(tuple(pending[i][self.keys].iloc[-1]) for i in live)
+            ready = []
+            for i, frame in enumerate(pending):
+                if frame.empty:
+                    continue
+                less = _less_than(frame, self.keys, bound)
+                if less.any():
+                    ready.append(frame[less])
+                    pending[i] = frame[~less]
+            if ready:
+                yield self._finish(pd.concat(ready, ignore_index=True))
+
+            for i in list(live):
+                frame = pending[i]
+                if frame.empty or tuple(frame[self.keys].iloc[-1]) == bound:
+                    piece = next(readers[i], None)
+                    if piece is None:
+                        live.discard(i)
+                    else:
+                        pending[i] = pd.concat([frame, piece], ignore_index=True)
+
+        rest = [frame for frame in pending if not frame.empty]
+        if rest:
+            yield self._finish(pd.concat(rest, ignore_index=True))
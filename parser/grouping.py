@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from utils.logger import get_logger
+
+logger = get_logger()
+
+
+def take_values(series, rows):
+    """
+    `series.to_numpy(dtype=object)[rows]`. Categorical columns are read
+    through their codes, so only the selected rows are ever turned into
+    objects, all sharing the category strings.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # code -1 marks a missing cell and picks the trailing NaN
+        categories = np.append(np.asarray(series.cat.categories, dtype=object), np.nan)
+        return categories[series.cat.codes.to_numpy()[rows]]
+    return series.to_numpy(dtype=object)[rows]
+
+
+def _sorted_codes(series):
+    """`pd.factorize(series, sort=True)`, with categoricals ranked by value rather than category order."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return pd.factorize(series, sort=True)
+    ranks, uniques = pd.factorize(np.asarray(series.cat.categories, dtype=object), sort=True)
+    codes = series.cat.codes.to_numpy()
+    return np.where(codes >= 0, ranks[codes], -1), uniques
+
+
+class GroupedRows:
+    """
+    Rows of a DataFrame grouped by `keys`, in the same order as
+    `df.groupby(keys)`, but found with one stable sort.
+
+    Rows whose key is missing or blank are dropped (as groupby does for NaN).
+    `order` lists the kept rows sorted by key, group i is
+    `order[starts[i]:stops[i]]`, and `key_values[key][i]` is its key.
+    """
+
+    def __init__(self, df, keys):
+        self.keys = list(keys)
+        n = len(df)
+
+        codes = []
+        valid = np.ones(n, dtype=bool)
+        for key in self.keys:
+            key_codes, uniques = _sorted_codes(df[key])
+            valid &= key_codes >= 0
+            # normalized sheets mark missing cells with "" rather than NaN
+            blank = np.flatnonzero(np.asarray(uniques, dtype=object) == "")
+            if len(blank):
+                valid &= key_codes != blank[0]
+            codes.append(key_codes)
+
+        rows = np.flatnonzero(valid)
+        if len(rows) < n:
+            logger.warning(f"Dropped {n - len(rows)} rows with a blank {' / '.join(self.keys)}")
+        # lexsort is stable and treats its last key as the primary one
+        order = rows[np.lexsort([c[rows] for c in reversed(codes)])]
+        self.order = order
+
+        if len(order):
+            changed = np.zeros(len(order) - 1, dtype=bool)
+            for key_codes in codes:
+                changed |= np.diff(key_codes[order]) != 0
+            self.starts = np.concatenate(([0], np.flatnonzero(changed) + 1))
+            self.stops = np.append(self.starts[1:], len(order))
+        else:
+            self.starts = np.empty(0, dtype=np.intp)
+            self.stops = np.empty(0, dtype=np.intp)
+
+        self.key_values = {key: take_values(df[key], order[self.starts]) for key in self.keys}
+
+    def __len__(self):
+        return len(self.starts)
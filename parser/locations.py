@@ -0,0 +1,104 @@
+import pandas as pd
+from scripts.region_details import (
+    cache_stats, fetch_city_details, fetch_country_details, fetch_state_details, prefetch_countries
+)
+from utils.logger import get_logger
+
+logger = get_logger()
+
+# Columns added by the enrichment stage, holding the location service's details
+CITY_DETAILS = "_city_details"
+STATE_DETAILS = "_state_details"
+COUNTRY_DETAILS = "_country_details"
+BANK_COUNTRY_DETAILS = "_bank_country_details"
+
+
+def prefetch_sheet_countries(df, columns):
+    """
+    Resolve the distinct country codes of `columns` in batched requests, so
+    the per-record lookups of the payload generators are cache hits. On
+    failure the records still look their countries up one by one.
+    """
+    codes = set()
+    for column in columns:
+        if column in df.columns:
+            codes.update(str(value) for value in df[column].unique() if value != "")
+    if not codes:
+        return
+    try:
+        prefetch_countries(sorted(codes))
+    except Exception as e:
+        logger.warning(f"Country prefetch failed, looking countries up per record: {e}")
+
+
+def _key_frame(df, columns):
+    """`columns` of `df` as plain objects, "" for the ones the sheet lacks."""
+    return pd.DataFrame(
+        {column: df[column].astype(object) if column in df.columns else "" for column in columns}, index=df.index
+    )
+
+
+def _enrich(df, columns, details_column, resolve):
+    """
+    Add `details_column` to `df`: resolve(*values) is called once per
+    distinct combination of `columns` and merged back onto every row.
+    """
+    keys = _key_frame(df, columns)
+    reference = keys.drop_duplicates(ignore_index=True)
+    reference[details_column] = [resolve(*values) for values in reference.itertuples(index=False, name=None)]
+    merged = keys.merge(reference, on=list(columns), how="left")
+    return df.assign(**{details_column: merged[details_column].to_numpy(dtype=object)})
+
+
+def _fetch(kind, label, fetch, *args):
+    try:
+        return fetch(*args)
+    except Exception as e:
+        raise ValueError(f"error while fetching {kind} details for {label}: {e}")
+
+
+def _le_country(code):
+    return {} if code == "" else _fetch("country", code, fetch_country_details, code)
+
+
+def enrich_le_party(df):
+    """
+    The sheet with the city, state, country and bank country details of each
+    row resolved up front, one lookup per distinct location, so that
+    LEPartyPayload makes no requests. A failed lookup fails the sheet.
+    """
+    prefetch_sheet_countries(df, ("Country", "Bank Country"))
+    df = _enrich(
+        df, ("Country", "State", "City"), CITY_DETAILS,
+        lambda country, state, city: _fetch("city", city, fetch_city_details, city, state, country)
+    )
+    df = _enrich(
+        df, ("Country", "State"), STATE_DETAILS,
+        lambda country, state: _fetch("state", state, fetch_state_details, state, country)
+    )
+    df = _enrich(df, ("Country",), COUNTRY_DETAILS, _le_country)
+    df = _enrich(df, ("Bank Country",), BANK_COUNTRY_DETAILS, _le_country)
+    logger.info(f"Region lookups (hits/misses per cache): {cache_stats()}")
+    return df
+
+
+def _master_country(code):
+    if code == "":
+        return None
+    try:
+        return fetch_country_details(code)
+    except Exception as e:
+        logger.error(f"Failed to fetch country details for {code}: {e}")
+        return None
+
+
+def enrich_master_party(df):
+    """
+    The sheet with the country of registration of each row resolved up
+    front, so that MasterPartyPayload makes no requests. Rows whose lookup
+    failed get None and an empty countryOfRegistration, as before.
+    """
+    prefetch_sheet_countries(df, ("Country",))
+    df = _enrich(df, ("Country",), COUNTRY_DETAILS, _master_country)
+    logger.info(f"Region lookups (hits/misses per cache): {cache_stats()}")
+    return df
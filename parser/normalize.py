@@ -0,0 +1,46 @@
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def _is_blank(value):
+    # whitespace-only cells are kept as they are, as the generators always did
+    return value is None or value != value or str(value).strip().lower() == "nan"
+
+
+def normalize_blanks(df):
+    """
+    Return `df` with NaN, None and "nan" cells (any case, surrounding spaces
+    ignored) of every text column replaced by "". Other values, including
+    whitespace-only ones, are kept as they are, unstripped.
+
+    This runs once per sheet so the payload generators can read cells without
+    checking each one for NaN. Each distinct value of a column is tested once.
+    Categorical columns (see utils.excel_reader.compact_frame) stay
+    categorical: only their categories are cleaned.
+    """
+    cleaned = {}
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            cleaned[column] = _normalize_categorical(series)
+            continue
+        if not (series.dtype == object or pd.api.types.is_string_dtype(series.dtype)):
+            continue
+        codes, uniques = pd.factorize(series)
+        # code -1 marks a missing cell and picks the trailing ""
+        lookup = np.array(["" if _is_blank(u) else u for u in uniques] + [""], dtype=object)
+        cleaned[column] = pd.Series(lookup[codes], index=df.index, dtype=object)
+    return df.assign(**cleaned) if cleaned else df
+
+
+def _normalize_categorical(series):
+    categories = series.cat.categories
+    cleaned = ["" if _is_blank(c) else c for c in categories] + [""]
+    # blank categories merge into one "", missing cells (code -1) map to it as well
+    remap, uniques = pd.factorize(np.array(cleaned, dtype=object))
+    codes = remap[series.cat.codes.to_numpy()]
+    return pd.Series(
+        pd.Categorical.from_codes(codes, pd.Index(uniques, dtype=object)), index=series.index
+    )
@@ -0,0 +1,85 @@
+"""
+Payload generation of one sheet spread over worker processes.
+
+Every invoice is independent, so a large InvoiceBatch is cut into runs of
+whole invoices (InvoiceBatch.sub_batch) that are generated in a process pool.
+A worker receives only the column slices of its invoices, never the sheet's
+DataFrame, and returns their records with the payloads already encoded
+(output_writer.EncodedRecord), which are yielded in sheet order.
+"""
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from utils import json_io
+from utils.output_writer import EncodedRecord
+from utils.uuid_provider import configure_uuids, current_uuid_mode
+
+DEFAULT_CHUNK_INVOICES = 2000
+
+_workers = 1
+_chunk_invoices = DEFAULT_CHUNK_INVOICES
+
+
+def configure_generation(workers=1, chunk_invoices=DEFAULT_CHUNK_INVOICES):
+    """Generate with `workers` processes, `chunk_invoices` invoices per task; 1 generates in-process."""
+    global _workers, _chunk_invoices
+    if chunk_invoices < 1:
+        raise ValueError(f"Invoices per generation chunk must be positive, got {chunk_invoices}")
+    _workers = max(1, int(workers))
+    _chunk_invoices = int(chunk_invoices)
+
+
+def _init_worker(uuid_mode):
+    configure_uuids(uuid_mode)
+
+
+def _generate(generator_class, batch):
+    # Pickling a payload's many small dicts, and rebuilding them in the parent,
+    # costs about as much as generating it. Its JSON bytes are cheap to move and
+    # are what the writer needs anyway.
+    records = []
+    for record in generator_class().iter_generate(batch):
+        encoded = EncodedRecord(record)
+        encoded["payload"] = json_io.dumpb(record["payload"], pretty=False)
+        records.append(encoded)
+    return records
+
+
+def _context():
+    # Forking a process that already runs threads (pyarrow's pools, a sheet
+    # worker's executor) can deadlock the child, so workers are started from
+    # a clean fork server, or spawned where there is none
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # imported once by the server instead of by every worker
+    context.set_forkserver_preload(["__main__", __name__, "payload.invoice_engine"])
+    return context
+
+
+def iter_generate(generator, batch):
+    """
+    `generator.iter_generate(batch)`, run in worker processes when more than
+    one is configured and the batch holds more than one chunk of invoices.
+    """
+    if _workers <= 1 or len(batch) <= _chunk_invoices:
+        return generator.iter_generate(batch)
+    return _iter_parallel(type(generator), batch)
+
+
+def _iter_parallel(generator_class, batch):
+    pool = ProcessPoolExecutor(
+        max_workers=_workers, mp_context=_context(), initializer=_init_worker, initargs=(current_uuid_mode(),)
+    )
+    pending = deque()
+    try:
+        for start in range(0, len(batch), _chunk_invoices):
+            chunk = batch.sub_batch(start, min(start + _chunk_invoices, len(batch)))
+            pending.append(pool.submit(_generate, generator_class, chunk))
+            # a bounded number of chunks in flight, so finished ones never pile up
+            if len(pending) >= 2 * _workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        pool.shutdown(cancel_futures=True)
@@ -0,0 +1,39 @@
+import importlib
+from collections.abc import Mapping
+
+# Sheet name keyword -> (module, class) of its parser
+PARSERS = {
+    "AR_Invoice": ("parser.AR_Parser", "ARInvoiceParser"),
+    "AR_Credit Note": ("parser.AR_Credit_Note", "ARCreditNoteParser"),
+    "AP_Invoice": ("parser.AP_Invoice", "APInvoiceParser"),
+    "AP_Credit Note": ("parser.AP_Credit_Note", "APCreditNoteParser"),
+    "Masters_Party": ("parser.Masters_Party", "MasterPartyParser"),
+    "LE_Party": ("parser.LE_Party", "LEPartyParser"),
+}
+
+
+class ParserRegistry(Mapping):
+    """
+    Keyword -> parser class mapping that imports a parser, and the payload
+    modules behind it, only when it is first looked up, i.e. when a workbook
+    has a matching sheet. Iterating over the keywords imports nothing.
+    """
+
+    def __init__(self, parsers):
+        self._parsers = dict(parsers)
+        self._loaded = {}
+
+    def __getitem__(self, keyword):
+        if keyword not in self._loaded:
+            module_name, class_name = self._parsers[keyword]
+            self._loaded[keyword] = getattr(importlib.import_module(module_name), class_name)
+        return self._loaded[keyword]
+
+    def __iter__(self):
+        return iter(self._parsers)
+
+    def __len__(self):
+        return len(self._parsers)
+
+
+PARSER_MAP = ParserRegistry(PARSERS)
@@ -3,9 +3,7 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import numpy as np
-import pandas as pd
-from scripts.region_details import fetch_country_details, fetch_state_details, fetch_city_details
+from parser.locations import BANK_COUNTRY_DETAILS, CITY_DETAILS, COUNTRY_DETAILS, STATE_DETAILS
 
 class LEPartyPayload:
     def __init__(self):
@@ -13,37 +11,22 @@ class LEPartyPayload:
 
     def get_value(self, record, key, default = "", index = 0) -> str:
         """
-            Safely retrieve a value from a dictionary. Returns "" if:
-            - key is missing
-            - value is None
-            - value is NaN (pandas or numpy)
-            - value is an empty list or contains NaN
-            - value is the string "nan"
+            Get a value from the record as a string, or `default` if the key is
+            missing. The parser has already turned NaN, "nan" and blank cells
+            into "", so no per-cell NaN checks are needed.
         """
         value = record.get(key, default)
-
-        # None or missing
-        if value is None or value == "":
+        if value.__class__ is str:
+            return value
+        if value is None:
             return ""
-
-        # Handle list or array
-        if isinstance(value, (list, np.ndarray, pd.Series)):
-            if len(value) == 0:
-                return ""
-            val = value[index] if len(value) > index else value[0]
-            if pd.isna(val) or str(val).strip().lower() == "nan":
-                return ""
-            return str(val)
-
-        # Handle scalars
-        if pd.isna(value) or str(value).strip().lower() == "nan":
-            return ""
-
         return str(value)
-
     
     def generate(self, data):
-        payloads = []
+        return list(self.iter_generate(data))
+
+    def iter_generate(self, data):
+        """Yield one payload record at a time, so callers can stream them out."""
         
         for record in data:
             payload = {
@@ -70,13 +53,11 @@ class LEPartyPayload:
                 "deletedDocuments": [],
                 "segmentDetails": self._get_segment_details(record)
             }
-            payloads.append({
+            yield {
                 "payload": payload,
                 "masterParty": self.get_value(record, "Master Party ID", ""),
                 "row_number": record.get("row_number", [])
-            })
-        
-        return payloads
+            }
     
     def _get_address_details(self, record):
         return [{
@@ -85,7 +66,7 @@ class LEPartyPayload:
             "addressLine2": self.get_value(record, "Address Line 2", ""),
             "city": self._get_city_details(record),
             "state": self._get_state_details(record),
-            "country": self._get_country_details(record, "Country"),
+            "country": self._get_country_details(record, "Country", COUNTRY_DETAILS),
             "postalCode": self.get_value(record, "Postal Code", ""),
             "activeStatus": self.get_value(record, "Address Active?", ""),
             "shipToSite": self.get_value(record, "Ship to flag", "false"),
@@ -93,60 +74,43 @@ class LEPartyPayload:
             "supplierSite": self.get_value(record, "Supplier Site", "false")
         }]
     
+    # The location details are resolved by the parser's enrichment stage
+    # (parser.locations.enrich_le_party), so generating makes no requests.
     def _get_city_details(self, record):
-        city_name = self.get_value(record, "City", "")
-        state_code = self.get_value(record, "State", "")
-        country_code = self.get_value(record, "Country", "")
-
-        try:
-            city_details = fetch_city_details(city_name, state_code, country_code)
-            return {
-                "id": city_details.get("id", ""),
-                "name": city_details.get("name", ""),
-                "stateId": city_details.get("stateId", ""),
-                "stateName": city_details.get("stateName", ""),
-                "stateIso2Code": city_details.get("stateIso2", ""),
-                "countryId": city_details.get("countryId", ""),
-                "countryName": city_details.get("countryName", ""),
-                "countryIso2Code": city_details.get("countryIso2", ""),
-            }
-        
-        except Exception as e:
-            raise Exception(f"error while fetching state details for {city_name}: {e}")
+        city_details = record.get(CITY_DETAILS) or {}
+        return {
+            "id": city_details.get("id", ""),
+            "name": city_details.get("name", ""),
+            "stateId": city_details.get("stateId", ""),
+            "stateName": city_details.get("stateName", ""),
+            "stateIso2Code": city_details.get("stateIso2", ""),
+            "countryId": city_details.get("countryId", ""),
+            "countryName": city_details.get("countryName", ""),
+            "countryIso2Code": city_details.get("countryIso2", ""),
+        }
     
     def _get_state_details(self, record):
-        state_details = {}
-        country_iso2code = self.get_value(record, "Country", "")
-        state_iso2code = self.get_value(record, "State", "")
-        try:
-            state_details = fetch_state_details(state_iso2code, country_iso2code)
-            return {
-                "id": state_details.get("id", ""),
-                "name": state_details.get("name", ""),
-                "stateIso2": state_details.get("stateIso2", ""),
-                "countryId": state_details.get("countryId", ""),
-                "countryIso2": state_details.get("countryIso2", ""),
-                "countryName": state_details.get("countryName", ""),
-            }
-        except Exception as e:
-            raise Exception(f"error while fetching state details for {state_iso2code}: {e}")
+        state_details = record.get(STATE_DETAILS) or {}
+        return {
+            "id": state_details.get("id", ""),
+            "name": state_details.get("name", ""),
+            "stateIso2": state_details.get("stateIso2", ""),
+            "countryId": state_details.get("countryId", ""),
+            "countryIso2": state_details.get("countryIso2", ""),
+            "countryName": state_details.get("countryName", ""),
+        }
     
-    def _get_country_details(self, record, field):
-        iso2code = self.get_value(record, field, "")
-        country_details = {}
-        if iso2code == "":
-            return country_details
-        try:
-            country_details = fetch_country_details(iso2code)
-            return {
-                "id": country_details.get("id", ""),
-                "name": country_details.get("name", ""),
-                "iso2Code": country_details.get("iso2", ""),
-                "iso3Code": country_details.get("iso3", ""),
-                "phoneCode": country_details.get("phonecode", ""),
-            }
-        except Exception as e:
-            raise Exception(f"error while fetching country details for {iso2code}: {e}")
+    def _get_country_details(self, record, field, details_field):
+        if self.get_value(record, field, "") == "":
+            return {}
+        country_details = record.get(details_field) or {}
+        return {
+            "id": country_details.get("id", ""),
+            "name": country_details.get("name", ""),
+            "iso2Code": country_details.get("iso2", ""),
+            "iso3Code": country_details.get("iso3", ""),
+            "phoneCode": country_details.get("phonecode", ""),
+        }
 
     
     def _get_contact_details(self, record):
@@ -183,7 +147,7 @@ class LEPartyPayload:
             "ibanCode": self.get_value(record, "IBAN Code", ""),
             "defaultBank": self.get_value(record, "Bank Default", "false"),
             "activeStatus": self.get_value(record, "Bank Active?", "ACTIVE"),
-            "bankCountry": self._get_country_details(record, "Bank Country")
+            "bankCountry": self._get_country_details(record, "Bank Country", BANK_COUNTRY_DETAILS)
         }
 
 
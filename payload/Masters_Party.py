@@ -1,7 +1,5 @@
-from scripts.region_details import fetch_country_details
+from parser.locations import COUNTRY_DETAILS
 from utils.logger import get_logger
-import pandas as pd
-import numpy as np
 
 logger = get_logger()
 
@@ -10,26 +8,23 @@ class MasterPartyPayload:
         pass
 
     def get_value(self, record, key, default="", index=0) -> str:
+        """
+            Get a value from the record as a string, or `default` if the key is
+            missing. The parser has already turned NaN, "nan" and blank cells
+            into "", so no per-cell NaN checks are needed.
+        """
         value = record.get(key, default)
-
-        if value is None or value == "":
-            return ""
-
-        if isinstance(value, (list, np.ndarray, pd.Series)):
-            if len(value) == 0:
-                return ""
-            val = value[index] if len(value) > index else value[0]
-            if pd.isna(val) or str(val).strip().lower() == "nan":
-                return ""
-            return str(val)
-
-        if pd.isna(value) or str(value).strip().lower() == "nan":
+        if value.__class__ is str:
+            return value
+        if value is None:
             return ""
-
         return str(value)
 
     def generate(self, data):
-        payloads = []
+        return list(self.iter_generate(data))
+
+    def iter_generate(self, data):
+        """Yield one payload record at a time, so callers can stream them out."""
 
         for record in data:
             payload = {
@@ -46,27 +41,22 @@ class MasterPartyPayload:
                 "companyPhoneCode": self.get_value(record, "Company Phone Code")
             }
 
-            try:
-                iso2_code = self.get_value(record, "Country")
-                if iso2_code:
-                    country_details = fetch_country_details(iso2_code)
-                    payload["countryOfRegistration"] = {
-                        "id": country_details.get("id", ""),
-                        "name": country_details.get("name", ""),
-                        "iso2Code": country_details.get("iso2", ""),
-                        "iso3Code": country_details.get("iso3", ""),
-                        "phoneCode": country_details.get("phonecode", "")
-                    }
-            except Exception as e:
-                logger.error(f"Failed to fetch country details for {iso2_code}: {e}")
+            # resolved by parser.locations.enrich_master_party; None when the lookup failed
+            country_details = record.get(COUNTRY_DETAILS)
+            if self.get_value(record, "Country") and country_details is not None:
+                payload["countryOfRegistration"] = {
+                    "id": country_details.get("id", ""),
+                    "name": country_details.get("name", ""),
+                    "iso2Code": country_details.get("iso2", ""),
+                    "iso3Code": country_details.get("iso3", ""),
+                    "phoneCode": country_details.get("phonecode", "")
+                }
 
             logger.info("Master party: " + str(payload))
 
-            payloads.append({
+            yield {
                 "payload": payload,
                 "row_number": record.get("row_number", ""),
                 "dunsNumber": self.get_value(record, "DUNS"),
                 "masterPartyName": self.get_value(record, "Party Name")
-            })
-
-        return payloads
+            }
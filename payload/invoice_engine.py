@@ -0,0 +1,288 @@
+import pandas as pd
+from utils.config_loader import load_config
+from utils.excel_reader import SPLIT_PART_COLUMN
+from utils.logger import get_logger
+from utils.uuid_provider import get_uuid_provider
+from parser.dates import epoch_column, to_epoch_strings
+
+logger = get_logger()
+
+
+class Header:
+    """Value of `column` on the first line of the invoice."""
+
+    __slots__ = ("column",)
+
+    def __init__(self, column):
+        self.column = column
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.column!r})"
+
+
+class Epoch(Header):
+    """Epoch millisecond string of a header date column, or None when blank."""
+
+
+class Line(Header):
+    """Value of `column` on the current line."""
+
+
+class _Placeholder:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+UUID = _Placeholder("UUID")            # a fresh validationUUID
+LINE_UUID = _Placeholder("LINE_UUID")  # the validationUUID shared by a line and its tax rule
+COA_CODE = _Placeholder("COA_CODE")    # the configured chart of accounts code
+SEGMENTS = _Placeholder("SEGMENTS")    # segment list built from config['segment_mapping']
+LINES = _Placeholder("LINES")          # one `line` template per invoice line
+TAX_RULES = _Placeholder("TAX_RULES")  # tax rule list of the current line
+
+ACCESS_IDENTIFIER_CODES = {
+    "coaCode": COA_CODE,
+    "legalEntityCode": Header("LEGAL_ENTITY"),
+    "businessUnitCode": Header("BUSINESS_UNIT"),
+    "locationCode": Header("LOCATION"),
+}
+
+
+class InvoiceSpec:
+    """
+    Declarative mapping from a sheet to one invoice document type.
+
+    `header` and `line` are payload templates: nested dicts whose leaves are
+    constants, column references (Header, Epoch, Line) or placeholders filled
+    in by the engine. Key order in the template is key order in the output.
+
+    `name` identifies the document type in deterministic validationUUIDs.
+    """
+
+    def __init__(self, name, header, line, line_count_column="Line"):
+        self.name = name
+        self.header = header
+        self.line = line
+        self.line_count_column = line_count_column
+
+
+def _text(value):
+    if value.__class__ is str:
+        return value
+    return "" if value is None else str(value)
+
+
+class _Cursor:
+    """Position of the engine in the grouped rows while building one invoice."""
+
+    __slots__ = ("index", "start", "stop", "position", "line_uuid", "document")
+
+
+TAX_RULE_COLUMNS = ("Is tax overriden", "Tax Rule", "Tax over ridden amount")
+
+
+def _references(template):
+    for node in template.values():
+        if isinstance(node, dict):
+            yield from _references(node)
+        elif isinstance(node, Header):
+            yield node
+
+
+class _CompiledSpec:
+    """
+    An InvoiceSpec bound to the columns of one InvoiceBatch. Every column
+    reference is resolved to its array once, so building an invoice only
+    indexes arrays and calls prebuilt accessors.
+    """
+
+    def __init__(self, spec, batch, segment_mapping, coa_code, uuids):
+        self.spec = spec
+        self.batch = batch
+        self.coa_code = coa_code
+        self.uuids = uuids
+
+        self.segment_sources = [
+            (column_name, self._header(Header(segment_name)), self._uuid(("segment", segment_name)))
+            for segment_name, column_name in segment_mapping.items() if column_name
+        ]
+        self.tax_flag, self.tax_rule_name, self.tax_amount = (self._line(Line(c)) for c in TAX_RULE_COLUMNS)
+
+        self.has_lines = spec.line_count_column in batch.lines
+        self.line_uuid = self._uuid(("line",), in_line=True)
+        self.build_line = self._compile(spec.line, ("line",), in_line=True)
+        self.build_header = self._compile(spec.header)
+        self.legal_entity = self._header(Header("LEGAL_ENTITY"))
+        self.invoice_number = self._header(Header("Invoice Number"))
+        self.row_numbers = batch.lines.get("row_number")
+        self.split_parts = batch.header.get(SPLIT_PART_COLUMN)
+
+    def _header(self, field):
+        if field.column in self.batch.header:
+            values = self.batch.header[field.column]
+            return lambda cursor: _text(values[cursor.index])
+        return lambda cursor: ""
+
+    def _epoch(self, field):
+        header = self.batch.header
+        if epoch_column(field.column) in header:
+            values = header[epoch_column(field.column)]
+        elif field.column in header:
+            # the parser did not precompute it, convert the column once here
+            values = to_epoch_strings(pd.Series(header[field.column]))
+        else:
+            return lambda cursor: None
+        return lambda cursor: values[cursor.index] or None
+
+    def _line(self, field):
+        if field.column in self.batch.lines:
+            values = self.batch.lines[field.column]
+            return lambda cursor: _text(values[cursor.position])
+        return lambda cursor: ""
+
+    def _uuid(self, path, in_line=False):
+        """
+        Accessor of the UUID at `path` in the payload. Deterministic UUIDs are
+        derived from the document key (and split part), the line index and that path.
+        """
+        uuids = self.uuids
+        if not uuids.content_derived:
+            new = uuids.new
+            return lambda cursor: new()
+        derive = uuids.derive
+        if in_line:
+            head, tail = path[0], ".".join(path[1:])
+            return lambda cursor: derive(*cursor.document, head, str(cursor.position - cursor.start), tail)
+        field = ".".join(path)
+        return lambda cursor: derive(*cursor.document, field)
+
+    def _compile(self, template, path=(), in_line=False):
+        steps = [
+            (key, self._compile_node(node, path + (key,), in_line)) for key, node in template.items()
+        ]
+
+        def build(cursor):
+            return {key: step(cursor) for key, step in steps}
+        return build
+
+    def _compile_node(self, node, path, in_line):
+        if isinstance(node, dict):
+            return self._compile(node, path, in_line)
+        if isinstance(node, Epoch):
+            return self._epoch(node)
+        if isinstance(node, Line):
+            return self._line(node)
+        if isinstance(node, Header):
+            return self._header(node)
+        if node is UUID:
+            return self._uuid(path, in_line)
+        if node is LINE_UUID:
+            return lambda cursor: cursor.line_uuid
+        if node is COA_CODE:
+            coa_code = self.coa_code
+            return lambda cursor: coa_code
+        if node is SEGMENTS:
+            return self._segments
+        if node is LINES:
+            return self._lines
+        if node is TAX_RULES:
+            return self._tax_rules
+        if isinstance(node, list):
+            return lambda cursor: list(node)
+        return lambda cursor: node
+
+    def _segments(self, cursor):
+        segments = []
+        for name, get_code, get_uuid in self.segment_sources:
+            code_value = get_code(cursor)
+            # Skip if code_value is empty
+            if code_value != "":
+                segments.append({
+                    "validationUUID": get_uuid(cursor),
+                    "name": name,
+                    "code": code_value
+                })
+        return segments
+
+    def _lines(self, cursor):
+        if not self.has_lines:
+            return []
+        lines = []
+        for position in range(cursor.start, cursor.stop):
+            cursor.position = position
+            cursor.line_uuid = self.line_uuid(cursor)
+            lines.append(self.build_line(cursor))
+        return lines
+
+    def _tax_rules(self, cursor):
+        tax_rule = {
+            "validationUUID": cursor.line_uuid,
+            "isTaxOverRidden": self.tax_flag(cursor).lower(),
+            "taxRuleName": self.tax_rule_name(cursor)
+        }
+        if tax_rule["isTaxOverRidden"] == "true":
+            tax_rule["taxOverRiddenAmount"] = self.tax_amount(cursor)
+        return [tax_rule]
+
+    def build(self, index):
+        cursor = _Cursor()
+        cursor.index = index
+        cursor.start = int(self.batch.starts[index])
+        cursor.stop = int(self.batch.stops[index])
+        legal_entity = self.legal_entity(cursor)
+        invoice_number = self.invoice_number(cursor)
+        cursor.document = (self.spec.name, legal_entity, invoice_number)
+        part = self.split_parts[index] if self.split_parts is not None else 0
+        if part:
+            # a later part of an invoice split in the sheet gets UUIDs of its own
+            cursor.document += (f"part {int(part)}",)
+
+        rows = self.row_numbers
+        return {
+            "payload": self.build_header(cursor),
+            "legal_entity": legal_entity,
+            "invoice_number": invoice_number,
+            "row_number": rows[cursor.start:cursor.stop].tolist() if rows is not None else []
+        }
+
+
+class InvoicePayloadEngine:
+    """
+    Shared payload generator for the invoice and credit note sheets.
+    Subclasses only set `spec`.
+    """
+
+    spec = None
+
+    def __init__(self, uuids=None):
+        config = load_config()
+        self.uuids = uuids or get_uuid_provider()
+        self.coa_code = config['coa_code'] if config['coa_code'] != "" else "DPWG_COA"
+        self.segment_mapping = config['segment_mapping'][self.coa_code]
+
+    def columns(self):
+        """(header columns, line columns) read by the spec, for building an InvoiceBatch."""
+        header = ["LEGAL_ENTITY", "Invoice Number", SPLIT_PART_COLUMN]
+        header += [segment_name for segment_name, column_name in self.segment_mapping.items() if column_name]
+        line = [self.spec.line_count_column, "row_number", *TAX_RULE_COLUMNS]
+        for field in _references(self.spec.header):
+            if isinstance(field, Epoch):
+                header.append(epoch_column(field.column))
+            header.append(field.column)
+        for field in _references(self.spec.line):
+            line.append(field.column)
+        return list(dict.fromkeys(header)), list(dict.fromkeys(line))
+
+    def generate(self, batch):
+        return list(self.iter_generate(batch))
+
+    def iter_generate(self, batch):
+        """Yield one payload record per invoice of a parser.documents.InvoiceBatch."""
+        compiled = _CompiledSpec(self.spec, batch, self.segment_mapping, self.coa_code, self.uuids)
+        for index in range(len(batch)):
+            yield compiled.build(index)
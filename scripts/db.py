@@ -3,28 +3,18 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import json
 import requests
-from dotenv import load_dotenv
 import time
-from token_manager import TokenManager
 from utils.logger import get_logger
 from utils.logger import CustomLogger
+from scripts.upload_common import get_token_manager, load_payload, parse_upload_args, select_output
 
-
-# Load environment variables from .env
-load_dotenv()
-custom_logger = CustomLogger("Migration_template_AR_Credit Note.json")
 logger = get_logger()
-tm = TokenManager("AUTH_HEADER", "accessToken")
-
 
-def load_payload(file_path):
-    with open(file_path, "r") as f:
-        return json.load(f)
+DEFAULT_OUTPUT = "Migration_template_AR_Credit Note.json"
 
 def send_payload(payload):
-    auth_token = tm.get_token()
+    auth_token = get_token_manager().get_token()
     headers = {
         "Content-Type": "application/json", 
         "Authorization": f"Bearer {auth_token}",
@@ -33,10 +23,11 @@ def send_payload(payload):
     response = requests.post(API_URL, json=payload, headers=headers)
     return response
 
-def main():
-    path_prefix = "data/output" # TODO: make it modular
-    file_name = "Migration_template_AR_Credit Note.json"
-    json_path = path_prefix + "/" + file_name
+def main(shard=None, rows=None, file_name=DEFAULT_OUTPUT):
+    json_path, log_name = select_output(file_name, shard)
+    if json_path is None:
+        return
+    custom_logger = CustomLogger(log_name)
     custom_logger.start_auto_flush()
 
     if not os.path.exists(json_path):
@@ -44,7 +35,7 @@ def main():
         return
 
     try:
-        payload = load_payload(json_path)
+        payload = load_payload(json_path, rows)
         for idx, i in enumerate(payload):
             response = send_payload(i.get("payload", {}))
 
@@ -70,4 +61,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_upload_args("Upload AR credit note payloads.", DEFAULT_OUTPUT)
+    main(args.shard, args.rows, args.output)
@@ -3,30 +3,29 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import json
 import requests
-from dotenv import load_dotenv
 import time
-from token_manager import TokenManager
 from utils.logger import get_logger
 from utils.logger import CustomLogger
+from scripts.upload_common import get_token_manager, load_payload, parse_upload_args, select_output
 import cloudscraper
 import certifi
 
-scraper = cloudscraper.create_scraper()
-
-# Load environment variables from .env
-load_dotenv()
-custom_logger = CustomLogger("Migration_template_Masters_Party.json")
 logger = get_logger()
-tm = TokenManager("AUTH_HEADER", "accessToken")
 
-def load_payload(file_path):
-    with open(file_path, "r") as f:
-        return json.load(f)
+DEFAULT_OUTPUT = "Migration_template_Masters_Party.json"
+_scraper = None
+
+
+def get_scraper():
+    global _scraper
+    if _scraper is None:
+        _scraper = cloudscraper.create_scraper()
+    return _scraper
+
 
 def send_payload(payload):
-    auth_token = tm.get_token()
+    auth_token = get_token_manager().get_token()
     headers = {
         'Content-Type': 'application/json',
         'Authorization': f"Bearer {auth_token}",
@@ -35,7 +34,7 @@ def send_payload(payload):
     API_URL = os.getenv("MASTER_PARTY_URL")
     response = {}
     try:
-        response = scraper.post(API_URL, json=payload, headers=headers, verify=certifi.where())
+        response = get_scraper().post(API_URL, json=payload, headers=headers, verify=certifi.where())
     except Exception as e:
         raise Exception("Error hitting the master party url: " + e)
     
@@ -51,24 +50,25 @@ def send_payload(payload):
     }
     approval_res = {}
     try:
-        approval_res = scraper.post(APPROVAL_URL, json=request_body, headers=headers, verify=certifi.where())
+        approval_res = get_scraper().post(APPROVAL_URL, json=request_body, headers=headers, verify=certifi.where())
     except Exception as e:
         raise Exception("Error hitting the master party approval url: " + e)
 
     return approval_res
     
 
-def main():
-    path_prefix = "data/output" # TODO: make it modular
-    file_name = "Migration_template_Masters_Party.json"
-    json_path = path_prefix + "/" + file_name
+def main(shard=None, rows=None, file_name=DEFAULT_OUTPUT):
+    json_path, log_name = select_output(file_name, shard)
+    if json_path is None:
+        return
+    custom_logger = CustomLogger(log_name)
 
     if not os.path.exists(json_path):
         logger.error(f"File not found: {json_path}")
         return
 
     try:
-        payload = load_payload(json_path)
+        payload = load_payload(json_path, rows)
         custom_logger.start_auto_flush()
         for idx, i in enumerate(payload):
             if "payload" in i:
@@ -96,4 +96,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_upload_args("Upload master party payloads.", DEFAULT_OUTPUT)
+    main(args.shard, args.rows, args.output)
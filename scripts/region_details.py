@@ -1,57 +1,207 @@
 import requests
-from scripts.token_manager import TokenManager
-from dotenv import load_dotenv
-import os
+from urllib.parse import urlencode
+from scripts.upload_common import get_env, get_token_manager
+from utils.config_loader import load_config
+from utils.location_store import location_settings
 from utils.logger import get_logger
+from utils.ttl_cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, TTLCache
 
 logger = get_logger()
-load_dotenv()
-tm = TokenManager("INT_TOKEN", "token")
+# longest country URL a prefetch request may build, query string included
+DEFAULT_MAX_URL_LENGTH = 2000
+# lookup name -> TTLCache, created from the locations config on first use
+_caches = {}
+
+
+def _cache(name):
+    if name not in _caches:
+        settings = load_config().get("locations", {})
+        _caches[name] = TTLCache(
+            settings.get("cache_entries", DEFAULT_MAX_ENTRIES),
+            settings.get("cache_ttl_seconds", DEFAULT_TTL_SECONDS),
+        )
+    return _caches[name]
+
+
+def cache_stats():
+    """Entries, hits, misses and evictions of each lookup cache used so far."""
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+def clear_caches():
+    for cache in _caches.values():
+        cache.clear()
+
+
+def _lookup(kind, key, request, build=None):
+    """
+    A lookup served from the in-process cache, then the location store
+    (unless older than the refresh age) and only then the service, whose
+    response is stored for later runs. Offline, the service is never called.
+    With `build`, the cache holds build(response) instead of the response.
+    """
+    def load():
+        value = _load(kind, key, request)
+        return value if build is None else build(value)
+
+    return _cache(kind).get_or_load(key, load)
+
+
+def _load(kind, key, request):
+    settings = location_settings()
+    store = settings["store"]
+    if store is not None:
+        value, age = store.get(kind, key, None if settings["offline"] else settings["refresh_after"])
+        if value is not None:
+            return value
+        if age is not None:
+            logger.debug(f"Refreshing {kind} details of {key}, stored {age / 86400:.1f} days ago")
+    if settings["offline"]:
+        raise ValueError(f"No stored {kind} details for {key} and location lookups are offline")
+    value = request()
+    if store is not None:
+        store.put(kind, key, value)
+    return value
+
+
+def _normalize_name(name):
+    """Names are matched ignoring case and repeated whitespace."""
+    return " ".join(str(name).split()).casefold()
+
+
+def _headers():
+    return {
+        "x-api-key": get_env("X_API_KEY"),
+        "X-LS-FieldMask": "*",
+        "x-location-service-integration-token": get_token_manager("INT_TOKEN", "token").get_token(),
+    }
+
 
 def fetch_country_details(country_codes):
     if not country_codes or country_codes == "":
         return {}
+    return _lookup("country", country_codes, lambda: _request_country(country_codes))
 
-    # Construct the request
-    token = tm.get_token()
-    headers = {
-        "x-api-key": os.getenv("X_API_KEY"),
-        "X-LS-FieldMask": "*",
-        "x-location-service-integration-token": token,
-    }
+
+def _request_country(country_codes):
     params = {
         "_countryIso2": country_codes
     }
-    
-    response = requests.get(os.getenv("COUNTRY_URL"), headers=headers, params=params)
+
+    response = requests.get(get_env("COUNTRY_URL"), headers=_headers(), params=params)
     listified_res = response.json()
     if len(listified_res) == 0:
         return {}
     return listified_res[0]
 
 
-def fetch_state_details(state_code, country_code):
+def _country_batches(codes, max_url_length):
+    """Split `codes` into pipe-joined batches whose request URL stays within max_url_length."""
+    base_length = len(get_env("COUNTRY_URL") or "") + 1  # "?"
+    batch = []
+    for code in codes:
+        candidate = batch + [code]
+        if batch and base_length + len(urlencode({"_countryIso2": "|".join(candidate)})) > max_url_length:
+            yield "|".join(batch)
+            candidate = [code]
+        batch = candidate
+    if batch:
+        yield "|".join(batch)
+
+
+def prefetch_countries(country_codes):
+    """
+    Resolve many countries up front, so that fetch_country_details() of any
+    of them is a cache hit. Codes found in the location store are taken from
+    there, the others are requested as pipe-joined _countryIso2 batches, as
+    few as the URL length allows. Offline, only the store is read.
+    """
+    settings = location_settings()
+    store = settings["store"]
+    cache = _cache("country")
+    wanted = []
+    for code in country_codes:
+        for part in str(code).split("|"):
+            if part and part not in cache and part not in wanted:
+                wanted.append(part)
+
+    missing = []
+    for code in wanted:
+        value = None
+        if store is not None:
+            value, _ = store.get("country", code, None if settings["offline"] else settings["refresh_after"])
+        if value is None:
+            missing.append(code)
+        else:
+            cache.put(code, value)
+    if not missing or settings["offline"]:
+        return
+
+    max_url_length = load_config().get("locations", {}).get("max_url_length", DEFAULT_MAX_URL_LENGTH)
+    batches = list(_country_batches(missing, max_url_length))
+    for batch in batches:
+        response = requests.get(get_env("COUNTRY_URL"), headers=_headers(), params={"_countryIso2": batch})
+        by_code = {country.get("iso2"): country for country in response.json()}
+        # codes without an exact match (unknown, or in another case) are left
+        # to fetch_country_details, which asks the service for them alone
+        resolved = [(code, by_code[code]) for code in batch.split("|") if code in by_code]
+        for code, value in resolved:
+            cache.put(code, value)
+        if store is not None:
+            store.put_many("country", resolved)
+    logger.info(f"Prefetched {len(missing)} countries in {len(batches)} requests")
+
+
+def fetch_state_details(state_code, country_code, match_names=None):
+    """
+    The state of a country with stateIso2 `state_code`. With match_names
+    (default: locations.match_state_names), a value matching no code is
+    looked up by state name too, and each such match is logged.
+    """
     if not state_code or state_code == "" or \
         not country_code or country_code == "":
         return {}
+    index = state_index(country_code)
+    state = index["by_code"].get(state_code)
+    if state is not None:
+        return state
+    if match_names is None:
+        match_names = load_config().get("locations", {}).get("match_state_names", False)
+    if match_names:
+        state = index["by_name"].get(_normalize_name(state_code))
+        if state is not None:
+            logger.warning(f"State {state_code!r} of {country_code} matched by name to {state.get('stateIso2')}")
+            return state
+    return {}
 
-    # construct the request
-    token = tm.get_token()
-    headers = {
-        "x-api-key": os.getenv("X_API_KEY"),
-        "X-LS-FieldMask": "*",
-        "x-location-service-integration-token": token,
-    }
+
+def state_index(country_code):
+    """
+    The states of a country by stateIso2 code ("by_code") and by normalized
+    name ("by_name"), built from one request for the country's state list.
+    """
+    return _lookup("states", country_code, lambda: _request_states(country_code), _build_state_index)
+
+
+def _build_state_index(states):
+    by_code = {}
+    by_name = {}
+    for state in states:
+        # the first of duplicate codes or names wins, as the linear filter did
+        by_code.setdefault(state.get("stateIso2") or "", state)
+        by_name.setdefault(_normalize_name(state.get("name") or ""), state)
+    by_code.pop("", None)
+    by_name.pop("", None)
+    return {"by_code": by_code, "by_name": by_name}
+
+
+def _request_states(country_code):
     params = {
         "_countryIso2": country_code
     }
-    
-    response = requests.get(os.getenv("STATE_URL"), headers=headers, params=params)
-    listified_res = response.json()
-    filtered_res = list(filter(lambda x: x["stateIso2"] == state_code, listified_res))
-    if len(filtered_res) == 0:
-        return {}
-    return filtered_res[0]
+
+    response = requests.get(get_env("STATE_URL"), headers=_headers(), params=params)
+    return response.json()
 
 
 def fetch_city_details(city_name, state_code, country_code):
@@ -59,21 +209,18 @@ def fetch_city_details(city_name, state_code, country_code):
         not state_code or state_code == "" or \
         not country_code or country_code == "":
         return {}
-    
-    # construct the request
-    token = tm.get_token()
-    headers = {
-        "x-api-key": os.getenv("X_API_KEY"),
-        "X-LS-FieldMask": "*",
-        "x-location-service-integration-token": token,
-    }
+    key = (city_name, state_code, country_code)
+    return _lookup("city", key, lambda: _request_city(*key))
+
+
+def _request_city(city_name, state_code, country_code):
     params = {
         "_countryIso2": country_code,
-        "_stateIso2": state_code, 
+        "_stateIso2": state_code,
         "q": city_name,
     }
-    
-    response = requests.get(os.getenv("CITY_URL"), headers=headers, params=params)
+
+    response = requests.get(get_env("CITY_URL"), headers=_headers(), params=params)
     listified_res = response.json()
     filtered_res = list(filter(lambda x: x["name"] == city_name, listified_res))
     if len(filtered_res) == 0:
@@ -82,4 +229,4 @@ def fetch_city_details(city_name, state_code, country_code):
 
 
 if __name__ == "__main__":
-    print(fetch_country_details("IN|AU|US"))
\ No newline at end of file
+    print(fetch_country_details("IN|AU|US"))
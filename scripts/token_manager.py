@@ -2,15 +2,14 @@ import time
 import requests
 from dotenv import load_dotenv, set_key
 import os
-import json
 import base64
 import random
 import threading
 from typing import Optional
 from utils.logger import get_logger
+from utils import json_io
 
 logger = get_logger()
-load_dotenv()
 
 def decode_jwt_exp(token: str) -> Optional[float]:
     """Decode JWT token to extract expiration time."""
@@ -18,7 +17,7 @@ def decode_jwt_exp(token: str) -> Optional[float]:
         payload = token.split('.')[1]
         padding = '=' * (-len(payload) % 4)
         decoded = base64.urlsafe_b64decode(payload + padding)
-        payload_json = json.loads(decoded)
+        payload_json = json_io.loads(decoded)
         return payload_json.get("exp")
     except Exception as e:
         logger.info(f"Failed to decode JWT: {e}")
@@ -115,8 +114,8 @@ class TokenManager:
                     raise TokenRefreshError(f"Missing request body environment variable: {self.name}_REQ_BODY")
                 
                 try:
-                    body = json.loads(req_body_env)
-                except json.JSONDecodeError as e:
+                    body = json_io.loads(req_body_env)
+                except json_io.JSONDecodeError as e:
                     raise TokenRefreshError(f"Invalid JSON in request body: {e}")
                 
                 # Get URL from environment
@@ -0,0 +1,92 @@
+import os
+import argparse
+from dotenv import load_dotenv
+from scripts.token_manager import TokenManager
+from utils.config_loader import load_config
+from utils.logger import get_logger
+from utils.output_writer import (
+    find_output_file, iter_output_records, iter_records_for_rows, shard_file, shard_index_path
+)
+
+logger = get_logger()
+
+# (token env var, token field) -> TokenManager
+_token_managers = {}
+_env_loaded = False
+
+
+def load_env():
+    """Load .env into the environment, once and on first use rather than at import."""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+
+def get_env(name):
+    """os.getenv(name), with .env loaded first."""
+    load_env()
+    return os.getenv(name)
+
+
+def get_token_manager(token_env="AUTH_HEADER", token_field="accessToken"):
+    """The token manager, created (and .env loaded) on first use rather than at import."""
+    key = (token_env, token_field)
+    if key not in _token_managers:
+        load_env()
+        _token_managers[key] = TokenManager(token_env, token_field)
+    return _token_managers[key]
+
+
+def get_output_dir():
+    """The directory main.py writes its outputs to (paths.output_dir of the config)."""
+    return load_config()["paths"]["output_dir"]
+
+
+def load_payload(file_path, rows=None):
+    """
+    Payload records, decompressed and parsed one at a time. With `rows`, only
+    the payloads built from those sheet rows (see row_number in the logs).
+    """
+    if rows:
+        return iter_records_for_rows(file_path, rows)
+    return iter_output_records(file_path)
+
+
+def select_output(file_name, shard=None):
+    """
+    The output file to upload (the given shard of it, or the file in
+    whichever compression it was written) and the name of its response log.
+    (None, None) when a shard is asked for but the output is not sharded.
+    """
+    json_path = os.path.join(get_output_dir(), file_name)
+    if shard is not None:
+        if not os.path.exists(shard_index_path(json_path)):
+            logger.error(f"Shard index not found: {shard_index_path(json_path)}")
+            return None, None
+        json_path = shard_file(json_path, shard)
+    else:
+        json_path = find_output_file(json_path) or json_path
+    # one response log per shard, so uploaders of different shards never share one
+    log_name = file_name if shard is None else f"{os.path.splitext(file_name)[0]}.shard{shard:02d}.json"
+    return json_path, log_name
+
+
+def parse_upload_args(description, default_output):
+    arg_parser = argparse.ArgumentParser(description=description)
+    arg_parser.add_argument(
+        "--output", default=default_output,
+        help=f"Output file under {get_output_dir()} to upload, e.g. the Grouped_<type>.json of main.py "
+             f"--global-grouping (default: {default_output})"
+    )
+    arg_parser.add_argument("--shard", type=int, help="Upload only this shard of an output written with main.py --shards")
+    arg_parser.add_argument(
+        "--row", dest="rows", type=int, action="append",
+        help="Only send the payloads built from this sheet row (repeatable), e.g. to retry failures. "
+             "Not for Grouped_<type> outputs, whose row numbers repeat across their sheets"
+    )
+    args = arg_parser.parse_args()
+    if args.rows and os.path.basename(args.output).startswith("Grouped_"):
+        # a grouped output is built from several sheets, each numbering its rows from 0
+        arg_parser.error("--row cannot select payloads of a Grouped_<type> output; upload the whole file")
+    return args
@@ -0,0 +1,170 @@
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+# the config is read from ./config, so run from the repository root as main.py does
+os.chdir(ROOT)
+
+from scripts import region_details, upload_common
+from utils import location_store, uuid_provider
+from utils.logger import get_logger
+
+# log to a scratch directory rather than the checkout's data/logs
+get_logger(tempfile.mkdtemp(prefix="cfl-test-logs-"))
+
+
+def make_sheet(invoices=12, seed=0):
+    """
+    An AR invoice sheet as read_sheet() returns it: text cells, NaN for empty
+    ones and a row_number column. Invoices have 1 to 3 lines and the rows are
+    shuffled, so the lines of an invoice are not contiguous.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(invoices):
+        header = {
+            "LEGAL_ENTITY": ["LE01", "LE02"][i % 2],
+            "Invoice Number": f"INV{i:03d}",
+            "Transaction Type": rng.choice(["Standard", "Service", None]),
+            "Customer": f"C{i % 5}",
+            "Currency": "USD",
+            "Invoice Date": f"{1 + i % 28:02d}/{1 + i % 12:02d}/2024",
+            "Due Date": rng.choice(["2024-06-30", "31/07/2024", None]),
+        }
+        for line in range(1, rng.integers(1, 4) + 1):
+            rows.append({
+                **header,
+                "Line": str(line),
+                "Item": f"ITEM{rng.integers(10)}",
+                "Quantity": str(rng.integers(1, 20)),
+                "Unit Price": f"{rng.uniform(1, 100):.2f}",
+                "Is tax overriden": rng.choice(["TRUE", "FALSE"]),
+                "Tax Rule": "VAT",
+                "Tax over ridden amount": "1.5",
+            })
+
+    df = pd.DataFrame(rows).sample(frac=1, random_state=seed).reset_index(drop=True)
+    df = df.astype(object).where(df.notna(), np.nan)
+    df["row_number"] = df.index
+    return df
+
+
+def with_blank_cells(sheet):
+    """
+    `sheet` with the cells Excel users leave "empty": pandas' NA tokens in
+    Notes and an all-blank row, which shifts the row numbers after it.
+    """
+    sheet = sheet.assign(Notes=["N/A", "NULL", "nan", "-", "NA"] + ["note"] * (len(sheet) - 5))
+    blank = pd.DataFrame([[np.nan] * len(sheet.columns)], columns=sheet.columns)
+    sheet = pd.concat([sheet.iloc[:3], blank, sheet.iloc[3:]], ignore_index=True)
+    sheet["row_number"] = sheet.index
+    return sheet
+
+
+def write_workbook(path, sheets):
+    """Write {sheet name: DataFrame} as an .xlsx workbook, without the row_number read_sheet() adds."""
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for name, df in sheets.items():
+            df.drop(columns="row_number", errors="ignore").to_excel(writer, sheet_name=name, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def sheet():
+    return make_sheet()
+
+
+@pytest.fixture
+def deterministic_uuids(monkeypatch):
+    """Payloads built during the test get deterministic validationUUIDs."""
+    provider = uuid_provider.DeterministicUUIDs()
+    monkeypatch.setattr(uuid_provider, "_provider", provider)
+    return provider
+
+
+class FakeLocationService:
+    """
+    Stands in for requests.get of the location service: answers from the
+    tables below and records (kind, params) of every request.
+    """
+
+    env = {
+        "COUNTRY_URL": "https://locations.test/countries",
+        "STATE_URL": "https://locations.test/states",
+        "CITY_URL": "https://locations.test/cities",
+        "X_API_KEY": "test-key",
+    }
+    countries = {code: {"iso2": code, "name": name} for code, name in [
+        ("IN", "India"), ("AU", "Australia"), ("US", "United States"), ("AE", "United Arab Emirates"),
+    ]}
+    states = {
+        "US": [{"stateIso2": "NY", "name": "New York"}, {"stateIso2": "CA", "name": "California"}],
+        "IN": [{"stateIso2": "KA", "name": "Karnataka"}, {"stateIso2": "MH", "name": "Maharashtra"}],
+    }
+    cities = {
+        ("US", "NY"): [{"name": "New York City"}, {"name": "Buffalo"}],
+        ("IN", "KA"): [{"name": "Bengaluru"}, {"name": "Mysuru"}],
+    }
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, headers=None, params=None):
+        kinds = {value: name.split("_")[0].lower() for name, value in self.env.items() if name.endswith("_URL")}
+        if url not in kinds or (headers or {}).get("x-api-key") != self.env["X_API_KEY"]:
+            raise ValueError(f"Invalid URL {url}")
+        kind = kinds[url]
+        self.requests.append((kind, dict(params)))
+        country = params["_countryIso2"]
+        if kind == "country":
+            body = [self.countries[code] for code in country.split("|") if code in self.countries]
+        elif kind == "state":
+            body = self.states.get(country, [])
+        else:
+            body = [city for city in self.cities.get((country, params["_stateIso2"]), [])
+                    if params["q"].lower() in city["name"].lower()]
+        return _Response(body)
+
+    def count(self, kind):
+        return sum(1 for request_kind, _ in self.requests if request_kind == kind)
+
+
+class _Response:
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class _Token:
+    @staticmethod
+    def get_token():
+        return "token"
+
+
+@pytest.fixture
+def location_service(tmp_path, monkeypatch):
+    """
+    Region lookups of a fresh process against a FakeLocationService, with
+    empty caches and a location store in tmp_path. The service settings
+    come from a simulated .env, only there once upload_common.load_env ran.
+    """
+    service = FakeLocationService()
+    for name in service.env:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(upload_common, "_env_loaded", False)
+    monkeypatch.setattr(
+        upload_common, "load_dotenv", lambda: [monkeypatch.setenv(k, v) for k, v in service.env.items()]
+    )
+    monkeypatch.setattr(upload_common, "_token_managers", {("INT_TOKEN", "token"): _Token()})
+    monkeypatch.setattr(region_details, "_caches", {})
+    monkeypatch.setattr(region_details.requests, "get", service.get)
+    monkeypatch.setattr(location_store, "_settings", None)
+    location_store.configure_locations(offline=False, store_path=str(tmp_path / "locations.sqlite"))
+    return service
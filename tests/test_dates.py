@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from parser.dates import add_epoch_columns, epoch_column, to_epoch_strings
+
+DATES = [
+    "01/02/2024", "31/12/2023", "2024-06-30", "2024-06-30 13:45:00", "5 Mar 2024",
+    "03/04/2024 08:00", "1/2/2024", "", "01/02/2024",
+]
+
+
+def scalar_epoch(value):
+    """The conversion the generators did per cell before dates were bucketed."""
+    if value == "":
+        return None
+    return str(int(pd.to_datetime(value, dayfirst=True).timestamp() * 1000))
+
+
+@pytest.mark.filterwarnings("ignore::UserWarning")
+def test_matches_per_value_conversion():
+    assert to_epoch_strings(pd.Series(DATES, dtype=object)).tolist() == [scalar_epoch(v) for v in DATES]
+
+
+def test_dates_are_day_first():
+    assert to_epoch_strings(pd.Series(["01/02/2024"])).tolist() == ["1706745600000"]
+
+
+def test_blank_cells_are_none():
+    values = pd.Series(["", None, np.nan], dtype=object)
+
+    assert to_epoch_strings(values).tolist() == [None, None, None]
+
+
+def test_unparseable_dates_raise():
+    with pytest.raises(ValueError):
+        to_epoch_strings(pd.Series(["01/02/2024", "not a date"]))
+
+
+def test_epoch_columns_keep_none_for_blanks():
+    df = pd.DataFrame({"Invoice Date": ["01/02/2024", "", "31/12/2023"], "Due Date": ["", "", ""]})
+
+    result = add_epoch_columns(df, ["Invoice Date", "Due Date", "GRV date"])
+
+    assert result[epoch_column("Invoice Date")].tolist() == ["1706745600000", None, "1703980800000"]
+    assert result[epoch_column("Due Date")].tolist() == [None, None, None]
+    assert epoch_column("GRV date") not in result.columns
@@ -0,0 +1,57 @@
+import datetime
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+import main
+from conftest import with_blank_cells, write_workbook
+from utils.excel_reader import iter_sheet_chunks
+
+
+@pytest.fixture
+def typed_workbook(tmp_path):
+    """A sheet with the cell types openpyxl returns, error values, blank rows and a blank header."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Sheet"
+    ws.append(["Key", " Amount ", None, "Date", "Flag", "Key"])
+    ws.append(["a", 1.0, "x", datetime.datetime(2024, 2, 1), True, "dup"])
+    ws.append([None, None, None, None, None, None])
+    ws.append(["b", 2.5, "#N/A", datetime.datetime(2024, 2, 1, 13, 30), False, "n/a"])
+    ws.append(["c", 7, None, "01/02/2024", None, " NA "])
+    ws.append(["", None, "null"])
+    ws.append(["d", -3, "None", None, None, "NaN"])
+    ws.append([None, None, None, None, None, None])
+    path = tmp_path / "typed.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def invoice_workbook(tmp_path, sheet):
+    return write_workbook(tmp_path / "invoices.xlsx", {"AR_Invoice": with_blank_cells(sheet)})
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 10_000])
+@pytest.mark.parametrize("workbook, sheet_name", [("typed_workbook", "Sheet"), ("invoice_workbook", "AR_Invoice")])
+def test_chunks_equal_read_sheet(request, workbook, sheet_name, chunk_size):
+    file_path = request.getfixturevalue(workbook)
+    chunks = list(iter_sheet_chunks(file_path, sheet_name, chunk_size))
+
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks, ignore_index=True).astype(object),
+        main.read_sheet(file_path, sheet_name).astype(object),
+        check_index_type=False,
+    )
+
+
+def test_na_strings_and_blank_rows(typed_workbook):
+    df = pd.concat(iter_sheet_chunks(typed_workbook, "Sheet", 2), ignore_index=True)
+
+    # a row of blank and NA cells is blank too, the trailing blank row is dropped
+    assert df["row_number"].tolist() == [0, 1, 2, 3, 4, 5]
+    assert df.drop(columns="row_number").iloc[[1, 4]].isna().all(axis=None)
+    # only exact NA strings are missing
+    assert df["Key.1"].astype(object).where(df["Key.1"].notna(), None).tolist() == [
+        "dup", None, None, " NA ", None, None
+    ]
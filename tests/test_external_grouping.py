@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+from parser.AR_Parser import ARInvoiceParser
+from parser.external_grouping import SEQUENCE_COLUMN, ExternalGrouper
+from parser.grouping import GroupedRows
+from parser.normalize import normalize_blanks
+from conftest import make_sheet
+from utils.excel_reader import compact_frame
+
+KEYS = ARInvoiceParser.group_keys
+
+
+def grouped(sheet, memory_bytes, spill_dir=None, chunk_rows=5, piece_rows=2):
+    """An ExternalGrouper fed `sheet` in chunks of `chunk_rows` rows."""
+    grouper = ExternalGrouper(KEYS, memory_bytes, spill_dir, piece_rows=piece_rows)
+    for start in range(0, len(sheet), chunk_rows):
+        grouper.add(sheet.iloc[start:start + chunk_rows])
+    return grouper
+
+
+@pytest.mark.parametrize("memory_bytes", [1, 10**9], ids=["spilled", "in-memory"])
+def test_rows_come_out_in_grouped_order(sheet, tmp_path, memory_bytes):
+    with grouped(sheet, memory_bytes, tmp_path) as grouper:
+        frames = list(grouper.iter_chunks())
+
+    rows = pd.concat(frames, ignore_index=True)["row_number"].tolist()
+    assert rows == GroupedRows(normalize_blanks(sheet), KEYS).order.tolist()
+
+
+def test_spills_one_run_per_chunk_and_cleans_up(sheet, tmp_path):
+    with grouped(sheet, 1, tmp_path) as grouper:
+        runs = list(tmp_path.glob("grouping-*/run*.pkl"))
+        assert len(runs) == -(-len(sheet) // 5)
+        list(grouper.iter_chunks())
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_chunks_hold_complete_groups(sheet, tmp_path):
+    with grouped(sheet, 1, tmp_path) as grouper:
+        frames = list(grouper.iter_chunks())
+
+    assert len(frames) > 1
+    seen = set()
+    for frame in frames:
+        keys = set(frame[KEYS].itertuples(index=False, name=None))
+        assert not keys & seen
+        seen |= keys
+        # a group keeps the sheet order of its rows
+        for _, group in frame.groupby(KEYS):
+            assert group[SEQUENCE_COLUMN].is_monotonic_increasing
+
+
+def test_grouped_chunks_parse_like_the_whole_sheet(sheet, tmp_path, deterministic_uuids):
+    expected = ARInvoiceParser(sheet).parse()
+
+    with grouped(sheet, 1, tmp_path) as grouper:
+        records = [record for frame in grouper.iter_chunks() for record in ARInvoiceParser(frame).parse()]
+
+    assert records == expected
+
+
+def test_blank_keys_are_dropped(sheet, tmp_path):
+    sheet.loc[[0, 7], "Invoice Number"] = np.nan
+    sheet.loc[3, "LEGAL_ENTITY"] = "nan"
+
+    with grouped(sheet, 1, tmp_path) as grouper:
+        rows = pd.concat(grouper.iter_chunks(), ignore_index=True)["row_number"].tolist()
+
+    assert grouper.dropped == 3
+    assert rows == GroupedRows(normalize_blanks(sheet), KEYS).order.tolist()
+
+
+def test_compact_chunks_keep_groups_whole(tmp_path):
+    sheet = make_sheet(invoices=40)
+    chunks = [compact_frame(sheet.iloc[start:start + 20]) for start in range(0, len(sheet), 20)]
+
+    grouper = ExternalGrouper(KEYS, 1, tmp_path, piece_rows=3)
+    for chunk in chunks:
+        grouper.add(chunk)
+    with grouper:
+        frames = list(grouper.iter_chunks())
+
+    keys = [key for frame in frames for key in frame[KEYS].drop_duplicates().itertuples(index=False, name=None)]
+    assert len(keys) == len(set(keys)) == 40
+    rows = pd.concat(frames, ignore_index=True)["row_number"].tolist()
+    assert rows == GroupedRows(normalize_blanks(sheet), KEYS).order.tolist()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+from parser.documents import InvoiceBatch
+from parser.grouping import GroupedRows
+
+KEYS = ["LEGAL_ENTITY", "Invoice Number"]
+
+
+def groupby_rows(df, keys):
+    """(key, row labels) of every group, in df.groupby order."""
+    return [(key, rows.tolist()) for key, rows in df.groupby(keys, sort=True).groups.items()]
+
+
+def grouped_rows(grouped):
+    return [
+        (tuple(grouped.key_values[k][i] for k in grouped.keys), grouped.order[start:stop].tolist())
+        for i, (start, stop) in enumerate(zip(grouped.starts, grouped.stops))
+    ]
+
+
+def test_groups_match_groupby(sheet):
+    grouped = GroupedRows(sheet, KEYS)
+
+    assert len(grouped) == sheet.groupby(KEYS).ngroups
+    assert grouped_rows(grouped) == groupby_rows(sheet, KEYS)
+
+
+def test_blank_keys_are_dropped(sheet):
+    sheet.loc[[0, 1], "Invoice Number"] = np.nan
+    sheet.loc[2, "LEGAL_ENTITY"] = ""
+
+    grouped = GroupedRows(sheet, KEYS)
+
+    assert not {0, 1, 2} & set(grouped.order.tolist())
+    assert grouped_rows(grouped) == groupby_rows(sheet.drop(index=[2]), KEYS)
+
+
+def test_categorical_keys_group_by_value(sheet):
+    categorical = sheet.assign(**{
+        # categories deliberately not in sorted order
+        key: pd.Categorical(sheet[key], categories=sorted(sheet[key].unique(), reverse=True)) for key in KEYS
+    })
+
+    assert grouped_rows(GroupedRows(categorical, KEYS)) == grouped_rows(GroupedRows(sheet, KEYS))
+
+
+def test_empty_frame_has_no_groups():
+    grouped = GroupedRows(pd.DataFrame({key: [] for key in KEYS}, dtype=object), KEYS)
+
+    assert len(grouped) == 0
+    assert grouped.order.tolist() == []
+
+
+def test_invoice_batch_holds_first_line_headers(sheet):
+    batch = InvoiceBatch(sheet, KEYS, ["Customer"], ["Line", "row_number"])
+
+    for document, (key, rows) in zip(batch, groupby_rows(sheet, KEYS)):
+        assert document.key == key
+        assert document.header("Customer") == sheet.loc[rows[0], "Customer"]
+        assert document.lines("row_number").tolist() == sheet.loc[rows, "row_number"].tolist()
+        assert document.line_count == len(rows)
@@ -0,0 +1,66 @@
+import json
+import pytest
+from utils import json_io
+from utils.logger import CustomLogger
+
+DOCUMENT = {"b": [1, 2.5, None, True], "a": {"name": "Zürich", "nested": []}, "c": ""}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    """Run the test on orjson (when installed) and on the stdlib fallback."""
+    if request.param == "json":
+        monkeypatch.setattr(json_io, "orjson", None)
+    elif json_io.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+@pytest.fixture
+def pretty_default(monkeypatch):
+    monkeypatch.setattr(json_io, "_pretty", False)
+    return json_io.set_pretty
+
+
+@pytest.mark.parametrize("sort_keys", [False, True])
+def test_pretty_output_is_json_dumps_indent_2(backend, sort_keys):
+    expected = json.dumps(DOCUMENT, indent=2, sort_keys=sort_keys)
+
+    assert json_io.dumps(DOCUMENT, pretty=True, sort_keys=sort_keys) == expected
+    assert json_io.dumpb(DOCUMENT, pretty=True, sort_keys=sort_keys) == expected.encode("utf-8")
+
+
+@pytest.mark.parametrize("sort_keys", [False, True])
+def test_compact_output_round_trips(backend, sort_keys):
+    text = json_io.dumps(DOCUMENT, pretty=False, sort_keys=sort_keys)
+
+    assert "\n" not in text and ": " not in text
+    assert json.loads(text) == DOCUMENT
+    assert json_io.loads(json_io.dumpb(DOCUMENT, pretty=False, sort_keys=sort_keys)) == DOCUMENT
+    assert list(json.loads(text)) == (sorted(DOCUMENT) if sort_keys else list(DOCUMENT))
+
+
+def test_compact_is_the_default_and_pretty_opt_in(backend, pretty_default):
+    assert json_io.dumps(DOCUMENT) == json_io.dumps(DOCUMENT, pretty=False)
+
+    pretty_default(True)
+    assert json_io.dumps(DOCUMENT) == json.dumps(DOCUMENT, indent=2)
+    assert json_io.is_pretty()
+
+
+def test_decode_errors_share_one_exception(backend):
+    with pytest.raises(json_io.JSONDecodeError):
+        json_io.loads(b"{")
+
+
+@pytest.mark.parametrize("pretty", [False, True])
+def test_response_log_follows_the_pretty_setting(tmp_path, monkeypatch, pretty_default, pretty):
+    monkeypatch.chdir(tmp_path)
+    pretty_default(pretty)
+    log = CustomLogger("responses.json")
+    log.save_log_entry({"status": 200})
+    log.flush()
+
+    text = (tmp_path / "data" / "responses" / "responses.json").read_text(encoding="utf-8")
+    assert ("\n" in text) == pretty
+    assert [entry["status"] for entry in json.loads(text)] == [200]
@@ -0,0 +1,81 @@
+import subprocess
+import sys
+import textwrap
+import pytest
+from conftest import ROOT
+from parser.registry import ParserRegistry
+from utils import config_loader
+from utils.config_loader import load_config
+from utils.lazy_import import lazy_import
+
+
+def imported_after(tmp_path, code):
+    """sys.modules after running `code` in a fresh interpreter from the repository root."""
+    script = "\n".join([
+        "import sys",
+        "from utils.logger import get_logger",
+        f"get_logger({str(tmp_path)!r})",
+        textwrap.dedent(code).strip(),
+        "print(' '.join(sorted(sys.modules)))",
+    ])
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.split())
+
+
+def test_startup_imports_no_sheet_libraries_or_parsers(tmp_path):
+    imported = imported_after(tmp_path, """
+        import main
+        main.parse_args([])
+    """)
+
+    assert not imported & {"pandas", "numpy", "openpyxl", "pyarrow"}
+    assert not any(name.startswith("payload.") for name in imported)
+
+
+def test_sheet_lookup_imports_only_its_parser(tmp_path):
+    imported = imported_after(tmp_path, """
+        import main
+        main.detect_parser_by_sheet("AR_Invoice (2)")
+    """)
+
+    assert {"parser.AR_Parser", "payload.AR_Invoice"} <= imported
+    assert not imported & {"parser.AP_Invoice", "parser.LE_Party", "parser.Masters_Party", "payload.LEParty"}
+
+
+def test_registry_imports_on_lookup(monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    registry = ParserRegistry({"Colors": ("colorsys", "rgb_to_hsv")})
+
+    assert list(registry) == ["Colors"] and len(registry) == 1
+    assert "colorsys" not in sys.modules
+    assert registry["Colors"](1, 0, 0) == (0.0, 1.0, 1)
+    with pytest.raises(KeyError):
+        registry["Unknown"]
+
+
+def test_lazy_module_imports_on_first_use(monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    colorsys = lazy_import("colorsys")
+
+    assert "colorsys" not in sys.modules
+    assert colorsys.rgb_to_hsv(1, 0, 0) == (0.0, 1.0, 1)
+    assert "colorsys" in sys.modules
+
+
+def test_missing_optional_module_is_none():
+    assert lazy_import("no_such_package.parquet", optional=True) is None
+    assert lazy_import("colorsys", optional=True) is not None
+
+
+def test_config_is_read_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_loader, "_configs", {})
+    path = tmp_path / "config.yaml"
+    path.write_text("paths:\n  output_dir: first\n")
+    config = load_config(str(path))
+
+    path.write_text("paths:\n  output_dir: second\n")
+
+    assert load_config(str(path)) is config
+    assert config["paths"]["output_dir"] == "first"
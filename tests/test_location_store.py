@@ -0,0 +1,109 @@
+import pytest
+from scripts import region_details
+from scripts.region_details import fetch_city_details, fetch_country_details, prefetch_countries
+from utils import location_store
+from utils.location_store import LocationStore, configure_locations, location_settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(location_store.time, "time", clock)
+    return clock
+
+
+def reconfigure(**settings):
+    """configure_locations() that keeps the test's store unless told otherwise."""
+    settings.setdefault("store_path", location_settings()["store"].path)
+    return configure_locations(**settings)
+
+
+def new_process(monkeypatch):
+    """Forget the in-process lookup caches, as a later run starts without them."""
+    monkeypatch.setattr(region_details, "_caches", {})
+
+
+def test_responses_are_kept_across_connections(tmp_path, clock):
+    path = str(tmp_path / "nested" / "locations.sqlite")
+    store = LocationStore(path)
+    store.put("country", "IN", {"iso2": "IN"})
+    store.put_many("city", [(("Mysuru", "KA", "IN"), {"name": "Mysuru"}), (("Pune", "MH", "IN"), {})])
+    store.close()
+    clock.now += 60
+
+    store = LocationStore(path)
+    assert store.get("country", "IN") == ({"iso2": "IN"}, 60)
+    assert store.get("city", ("Pune", "MH", "IN")) == ({}, 60)
+    assert store.get("city", "Pune") == (None, None)
+    assert (store.count(), store.count("city")) == (3, 2)
+
+
+def test_responses_older_than_max_age_are_not_returned(tmp_path, clock):
+    store = LocationStore(str(tmp_path / "locations.sqlite"))
+    store.put("country", "IN", {"iso2": "IN"})
+    clock.now += 100
+
+    assert store.get("country", "IN", max_age=100) == ({"iso2": "IN"}, 100)
+    assert store.get("country", "IN", max_age=99) == (None, 100)
+
+
+def test_later_runs_are_served_from_the_store(location_service, monkeypatch):
+    fetch_country_details("IN")
+    fetch_city_details("Mysuru", "KA", "IN")
+
+    new_process(monkeypatch)
+    assert fetch_country_details("IN") == {"iso2": "IN", "name": "India"}
+    assert fetch_city_details("Mysuru", "KA", "IN") == {"name": "Mysuru"}
+    assert len(location_service.requests) == 2
+
+
+def test_stale_responses_are_requested_again(location_service, monkeypatch, clock):
+    fetch_country_details("IN")
+    clock.now += 2 * 86400
+
+    new_process(monkeypatch)
+    reconfigure(refresh_after_days=1)
+    fetch_country_details("IN")
+
+    assert location_service.count("country") == 2
+    assert location_settings()["store"].get("country", "IN")[1] == 0
+
+
+def test_offline_lookups_use_stored_responses_of_any_age(location_service, monkeypatch, clock):
+    fetch_country_details("IN")
+    clock.now += 365 * 86400
+
+    new_process(monkeypatch)
+    reconfigure(offline=True, refresh_after_days=1)
+    prefetch_countries(["IN", "AU"])
+
+    assert fetch_country_details("IN") == {"iso2": "IN", "name": "India"}
+    with pytest.raises(ValueError):
+        fetch_country_details("AU")
+    assert location_service.count("country") == 1
+
+
+def test_empty_store_path_disables_the_store(location_service, monkeypatch):
+    reconfigure(store_path="")
+    fetch_country_details("IN")
+
+    new_process(monkeypatch)
+    fetch_country_details("IN")
+
+    assert location_settings()["store"] is None
+    assert location_service.count("country") == 2
+
+
+def test_store_is_kept_while_its_path_is_unchanged(location_service):
+    store = location_settings()["store"]
+
+    assert reconfigure(offline=True)["store"] is store
+    assert reconfigure(store_path=store.path + ".other")["store"] is not store
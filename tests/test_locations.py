@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+from parser import locations
+from parser.LE_Party import LEPartyParser
+from parser.Masters_Party import MasterPartyParser
+from scripts import region_details
+
+LE_ROWS = [
+    # Master Party ID, Country, State, City, Bank Country
+    ("MP1", "US", "NY", "Buffalo", "US"),
+    ("MP2", "IN", "KA", "Mysuru", "AE"),
+    ("MP3", "US", "NY", "Buffalo", "IN"),
+    ("MP4", "US", "CA", "Fresno", None),
+    ("MP5", "IN", "KA", "Mysuru", "AE"),
+    ("MP6", None, None, None, None),
+]
+
+
+def le_party_sheet():
+    df = pd.DataFrame(LE_ROWS, columns=["Master Party ID", "Country", "State", "City", "Bank Country"], dtype=object)
+    df["row_number"] = df.index
+    return df
+
+
+def master_party_sheet(countries):
+    df = pd.DataFrame(
+        {"DUNS": [f"D{i}" for i in range(len(countries))], "Party Name": "Party", "Country": countries}, dtype=object
+    )
+    df["row_number"] = df.index
+    return df
+
+
+def address(record):
+    return record["payload"]["legalEntityPartyAddressDetailList"][0]
+
+
+def test_le_party_locations_are_resolved_once_per_distinct_value(location_service):
+    records = LEPartyParser(le_party_sheet()).parse()
+
+    assert [address(record)["city"]["name"] for record in records] == ["Buffalo", "Mysuru", "Buffalo", "", "Mysuru", ""]
+    assert [address(record)["state"]["name"] for record in records] == [
+        "New York", "Karnataka", "New York", "California", "Karnataka", ""
+    ]
+    assert [address(record)["country"].get("name") for record in records] == [
+        "United States", "India", "United States", "United States", "India", None
+    ]
+    assert [record["payload"]["legalEntityPartyBankDetailList"][0]["bankCountry"].get("iso2Code")
+            for record in records] == ["US", "AE", "IN", None, "AE", None]
+    # one country prefetch, one state list per country, one request per distinct city
+    assert location_service.requests[0] == ("country", {"_countryIso2": "AE|IN|US"})
+    assert (location_service.count("country"), location_service.count("state"), location_service.count("city")) \
+        == (1, 2, 3)
+
+
+def test_le_party_payloads_match_per_record_lookups(location_service):
+    records = LEPartyParser(le_party_sheet()).parse()
+
+    for record, (_, country, state, city, _) in zip(records, LE_ROWS):
+        if country:
+            state_details = region_details.fetch_state_details(state, country)
+            city_details = region_details.fetch_city_details(city, state, country)
+            assert address(record)["state"]["stateIso2"] == state_details["stateIso2"]
+            assert address(record)["city"]["name"] == city_details.get("name", "")
+
+
+def test_failed_le_party_lookup_fails_the_sheet(location_service, monkeypatch):
+    def unavailable(*args):
+        raise ConnectionError("service unavailable")
+
+    monkeypatch.setattr(region_details, "_request_city", unavailable)
+    with pytest.raises(ValueError, match="error while fetching city details for Buffalo"):
+        LEPartyParser(le_party_sheet()).parse()
+
+
+def test_master_party_country_failures_leave_the_country_empty(location_service, monkeypatch):
+    request_country = region_details._request_country
+    failed = []
+
+    def flaky(code):
+        if code == "AU":
+            failed.append(code)
+            raise ConnectionError("service unavailable")
+        return request_country(code)
+
+    monkeypatch.setattr(region_details, "_request_country", flaky)
+    # without a prefetch, so that every code is looked up on its own
+    monkeypatch.setattr(locations, "prefetch_countries", lambda codes: None)
+    records = MasterPartyParser(master_party_sheet(["IN", "AU", None, "AU", "IN"])).parse()
+
+    assert [record["payload"]["countryOfRegistration"].get("iso2Code") for record in records] == [
+        "IN", None, None, None, "IN"
+    ]
+    assert failed == ["AU"]
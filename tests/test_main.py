@@ -0,0 +1,56 @@
+import os
+import pytest
+import main
+from conftest import with_blank_cells, write_workbook
+from utils import json_io, uuid_provider
+from utils.output_writer import iter_output_records
+
+
+@pytest.fixture
+def run_sheet(tmp_path, monkeypatch):
+    """run_sheet(file_path, sheet_name, *argv): the records main.run_unit writes for one sheet."""
+    # run_unit configures these for the whole process
+    monkeypatch.setattr(uuid_provider, "_provider", None)
+    monkeypatch.setattr(json_io, "_pretty", False)
+    monkeypatch.setitem(main.config["paths"], "staging_dir", str(tmp_path / "staging"))
+    runs = iter(range(1000))
+
+    def run(file_path, sheet_name, *argv):
+        args = main.parse_args(["--uuid-mode", "deterministic", *argv])
+        output_file = str(tmp_path / f"out{next(runs)}" / f"{sheet_name}.json")
+        os.makedirs(os.path.dirname(output_file))
+        status, _, error = main.run_unit(file_path, sheet_name, output_file, args, {})
+        assert (status, error) == ("saved", None)
+        return list(iter_output_records(output_file))
+    return run
+
+
+@pytest.fixture
+def workbook(tmp_path, sheet):
+    return write_workbook(tmp_path / "invoices.xlsx", {"AR_Invoice": with_blank_cells(sheet)})
+
+
+def test_compact_does_not_change_the_output(workbook, run_sheet):
+    assert run_sheet(workbook, "AR_Invoice", "--compact") == run_sheet(workbook, "AR_Invoice")
+
+
+def document(record):
+    return record["legal_entity"], record["invoice_number"]
+
+
+def test_stream_writes_the_documents_of_a_whole_sheet_run(tmp_path, sheet, run_sheet):
+    contiguous = sheet.sort_values(["Invoice Number", "row_number"], ignore_index=True)
+    workbook = write_workbook(tmp_path / "contiguous.xlsx", {"AR_Invoice": with_blank_cells(contiguous)})
+
+    streamed = run_sheet(workbook, "AR_Invoice", "--stream", "--chunk-size", "4")
+
+    assert sorted(streamed, key=document) == sorted(run_sheet(workbook, "AR_Invoice"), key=document)
+
+
+def test_staged_stream_run_leaves_a_whole_sheet_run_unchanged(workbook, run_sheet):
+    expected = run_sheet(workbook, "AR_Invoice", "--no-cache")
+
+    run_sheet(workbook, "AR_Invoice", "--stream")
+
+    assert run_sheet(workbook, "AR_Invoice") == expected
+    assert run_sheet(workbook, "AR_Invoice") == expected
@@ -0,0 +1,119 @@
+import pandas as pd
+import pytest
+import main
+from conftest import write_workbook
+from utils import json_io, uuid_provider
+from utils.manifest import RunManifest, SheetHasher, config_hash, sheet_hash
+from utils.output_writer import iter_output_records
+
+KEPT = b"kept by the manifest"
+
+
+@pytest.fixture
+def run_main(tmp_path, monkeypatch):
+    """run_main(*argv): main.main over tmp_path/input, writing to tmp_path/output."""
+    monkeypatch.setattr(uuid_provider, "_provider", None)
+    monkeypatch.setattr(json_io, "_pretty", False)
+    monkeypatch.setitem(main.config["paths"], "input_dir", str(tmp_path / "input"))
+    monkeypatch.setitem(main.config["paths"], "output_dir", str(tmp_path / "output"))
+    (tmp_path / "input").mkdir()
+
+    def run(*argv):
+        # every run of main.py is a process of its own, which opens the workbooks anew
+        monkeypatch.setattr(main, "_open_workbooks", {})
+        failures = main.main(["--no-cache", "--workers", "1", "--uuid-mode", "deterministic", *argv])
+        assert failures == []
+    return run
+
+
+@pytest.fixture
+def workbook(tmp_path, sheet):
+    def write(sheet=sheet, notes="first"):
+        return write_workbook(
+            tmp_path / "input" / "invoices.xlsx", {"AR_Invoice": sheet, "Notes": pd.DataFrame({"note": [notes]})}
+        )
+    write()
+    return write
+
+
+@pytest.fixture
+def output(tmp_path):
+    return tmp_path / "output" / "invoices_AR_Invoice.json"
+
+
+def mark_kept(output):
+    """Overwrite `output`, so that a later run shows whether it was regenerated."""
+    output.write_bytes(KEPT)
+
+
+def test_unchanged_workbook_is_skipped(run_main, workbook, output):
+    run_main()
+    entry = RunManifest(str(output.parent / "manifest.json")).get(str(output))
+    mark_kept(output)
+
+    run_main()
+
+    assert output.read_bytes() == KEPT
+    assert RunManifest(str(output.parent / "manifest.json")).get(str(output)) == entry
+
+
+def test_edit_of_another_tab_keeps_the_output(run_main, workbook, output):
+    run_main()
+    mark_kept(output)
+
+    edited = workbook(notes="second")
+    run_main()
+
+    assert output.read_bytes() == KEPT
+    manifest = RunManifest(str(output.parent / "manifest.json"))
+    assert manifest.get(str(output))["workbook_hash"] == main.file_hash(edited)
+
+
+def test_edited_sheet_changed_options_and_force_regenerate(run_main, workbook, output, sheet):
+    run_main()
+    expected = list(iter_output_records(str(output)))
+
+    for argv in (["--force"], ["--pretty"]):
+        mark_kept(output)
+        run_main(*argv)
+        assert list(iter_output_records(str(output))) == expected
+
+    mark_kept(output)
+    sheet.loc[sheet["Invoice Number"] == "INV003", "Customer"] = "C99"
+    workbook(sheet)
+    run_main("--pretty")
+    assert output.read_bytes() != KEPT
+
+
+def test_missing_output_is_regenerated(run_main, workbook, output):
+    run_main()
+    output.unlink()
+
+    run_main()
+
+    assert output.exists()
+
+
+def test_corrupt_manifest_is_ignored(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text("{")
+
+    assert RunManifest(str(path)).entries == {}
+
+
+def test_sheet_hash_ignores_chunking_and_dtype(sheet):
+    hashed = sheet_hash(sheet)
+    hasher = SheetHasher()
+    for start in range(0, len(sheet), 5):
+        hasher.update(sheet.iloc[start:start + 5])
+
+    assert hasher.hexdigest() == hashed
+    assert sheet_hash(sheet.astype({"Customer": "str"})) == hashed
+    assert sheet_hash(sheet.assign(Customer=sheet["Customer"].where(sheet.index != 0, "C99"))) != hashed
+
+
+def test_config_hash_covers_payload_settings_only():
+    config = {"segment_mapping": {"a": 1}, "coa_code": "X", "paths": {"output_dir": "out"}}
+
+    assert config_hash(config) == config_hash({**config, "paths": {"output_dir": "elsewhere"}})
+    assert config_hash(config) != config_hash({**config, "coa_code": "Y"})
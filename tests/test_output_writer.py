@@ -0,0 +1,164 @@
+import os
+import pytest
+from parser.AR_Parser import ARInvoiceParser
+from scripts.upload_common import select_output
+from utils import json_io, output_writer
+from utils.config_loader import load_config
+from utils.output_writer import (
+    COMPRESSIONS, OFFSET_INDEX_SUFFIX, SHARD_INDEX_SUFFIX, EncodedRecord, OffsetIndex, check_compression,
+    find_output_file, iter_output_records, iter_records_for_rows, open_writer, shard_file, shard_index_path, shard_of
+)
+
+KEY = ARInvoiceParser.shard_key
+INDEXED = {"offset_index": True, "index_fields": ARInvoiceParser.index_fields}
+
+
+@pytest.fixture
+def records(sheet, deterministic_uuids):
+    return ARInvoiceParser(sheet).parse()
+
+
+@pytest.fixture(params=list(COMPRESSIONS))
+def compression(request):
+    if request.param == "zstd" and output_writer.zstandard is None:
+        pytest.skip("zstandard is not installed")
+    return request.param
+
+
+def write(path, records, **options):
+    with open_writer(str(path), **options) as writer:
+        writer.write_all(records)
+    return str(path)
+
+
+def document(record):
+    return record["legal_entity"], record["invoice_number"]
+
+
+def read_shards(output_file):
+    shards = len(json_io.read_json(shard_index_path(output_file))["shards"])
+    return [list(iter_output_records(shard_file(output_file, shard))) for shard in range(shards)]
+
+
+@pytest.mark.parametrize("output_format", ["json", "jsonl"])
+def test_shards_split_records_by_key_in_order(tmp_path, records, output_format):
+    output_file = str(tmp_path / f"AR.{output_format}")
+    write(shard_index_path(output_file), records, output_format=output_format, shards=3, shard_key=KEY)
+
+    shards = read_shards(output_file)
+    index = json_io.read_json(shard_index_path(output_file))
+
+    assert sorted(map(document, sum(shards, []))) == sorted(map(document, records))
+    for number, (shard, entry) in enumerate(zip(shards, index["shards"])):
+        assert shard == [record for record in records if shard_of(record[KEY], 3) == number]
+        assert entry["records"] == len(shard)
+        assert entry["keys"] == list(dict.fromkeys(record[KEY] for record in shard))
+    assert index["shard_key"] == KEY
+
+
+def test_fewer_shards_remove_the_leftover_files(tmp_path, records):
+    index_path = str(tmp_path / f"AR{SHARD_INDEX_SUFFIX}")
+    write(index_path, records, shards=4, shard_key=KEY)
+
+    write(index_path, records, shards=2, shard_key=KEY)
+
+    assert sorted(os.listdir(tmp_path)) == ["AR.shard00.json", "AR.shard01.json", f"AR{SHARD_INDEX_SUFFIX}"]
+
+
+def test_failed_sheet_leaves_no_shards(tmp_path, records):
+    with pytest.raises(RuntimeError):
+        with open_writer(str(tmp_path / f"AR{SHARD_INDEX_SUFFIX}"), shards=2, shard_key=KEY) as writer:
+            writer.write_all(records)
+            raise RuntimeError("parser failed")
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_uploaders_select_a_shard(tmp_path, records, monkeypatch):
+    monkeypatch.setitem(load_config()["paths"], "output_dir", str(tmp_path))
+    write(tmp_path / f"AR{SHARD_INDEX_SUFFIX}", records, shards=2, shard_key=KEY)
+
+    assert select_output("AR.json", shard=1) == (str(tmp_path / "AR.shard01.json"), "AR.shard01.json")
+    assert select_output("AP.json", shard=1) == (None, None)
+    with pytest.raises(ValueError):
+        select_output("AR.json", shard=2)
+
+
+@pytest.mark.parametrize("output_format, pretty", [("json", False), ("json", True), ("jsonl", False)])
+def test_compressed_output_reads_back_as_written(tmp_path, records, compression, output_format, pretty, monkeypatch):
+    monkeypatch.setattr(json_io, "_pretty", pretty)
+    output_file = write(
+        tmp_path / f"AR.{output_format}{COMPRESSIONS[compression]}", records,
+        output_format=output_format, compression=compression
+    )
+
+    assert list(iter_output_records(output_file)) == records
+    assert find_output_file(str(tmp_path / "AR.json")) == output_file
+    with open(output_file, "rb") as f:
+        assert (f.read(1) in b"[{") == (compression == "none")
+
+
+def test_encoded_payloads_are_written_as_they_are(tmp_path, records, compression):
+    encoded = [EncodedRecord(record, payload=json_io.dumpb(record["payload"], pretty=False)) for record in records]
+
+    output_file = write(tmp_path / f"AR.json{COMPRESSIONS[compression]}", encoded, compression=compression)
+
+    assert list(iter_output_records(output_file)) == records
+
+
+def test_newest_output_is_found(tmp_path, records):
+    older = write(tmp_path / "AR.json", records)
+    newer = write(tmp_path / "AR.jsonl.gz", records, output_format="jsonl", compression="gzip")
+    os.utime(older, (0, 0))
+
+    assert find_output_file(str(tmp_path / "AR.json")) == newer
+    assert find_output_file(str(tmp_path / "AP.json")) is None
+
+
+def test_unknown_compression_is_rejected():
+    with pytest.raises(ValueError):
+        check_compression("brotli")
+
+
+@pytest.mark.parametrize("output_format, pretty", [("json", False), ("json", True), ("jsonl", False)])
+def test_offset_index_finds_records(tmp_path, records, compression, output_format, pretty, monkeypatch):
+    monkeypatch.setattr(json_io, "_pretty", pretty)
+    output_file = write(
+        tmp_path / f"AR.{output_format}{COMPRESSIONS[compression]}", records,
+        output_format=output_format, compression=compression, **INDEXED
+    )
+    index = OffsetIndex(output_file)
+    wanted = records[3]
+
+    assert len(index.entries) == len(records)
+    assert index.lookup(legal_entity=wanted["legal_entity"], invoice_number=wanted["invoice_number"]) == [wanted]
+    assert index.lookup(legal_entity="LE99") == []
+    rows = wanted["row_number"][:1] + records[5]["row_number"]
+    assert list(index.lookup_rows(rows)) == [wanted, records[5]]
+
+
+def test_rows_are_found_with_and_without_an_index(tmp_path, records):
+    indexed = write(tmp_path / "indexed.json", records, **INDEXED)
+    scanned = write(tmp_path / "scanned.json", records)
+    rows = records[0]["row_number"] + records[-1]["row_number"]
+
+    assert not os.path.exists(scanned + OFFSET_INDEX_SUFFIX)
+    assert list(iter_records_for_rows(indexed, rows)) == list(iter_records_for_rows(scanned, rows))
+    assert list(iter_records_for_rows(indexed, rows)) == [records[0], records[-1]]
+
+
+def test_output_written_without_an_index_drops_the_old_one(tmp_path, records):
+    output_file = write(tmp_path / "AR.json", records, **INDEXED)
+
+    write(output_file, records[:2])
+
+    assert not os.path.exists(output_file + OFFSET_INDEX_SUFFIX)
+
+
+def test_every_shard_has_its_own_index(tmp_path, records):
+    output_file = str(tmp_path / "AR.json")
+    write(shard_index_path(output_file), records, shards=2, shard_key=KEY, **INDEXED)
+
+    for shard, written in enumerate(read_shards(output_file)):
+        rows = [row for record in written for row in record["row_number"]]
+        assert list(OffsetIndex(shard_file(output_file, shard)).lookup_rows(rows)) == written
@@ -0,0 +1,52 @@
+import pytest
+from conftest import make_sheet
+from parser import parallel
+from parser.AR_Parser import ARInvoiceParser
+from parser.parallel import configure_generation
+from utils import json_io
+from utils.output_writer import EncodedRecord
+
+
+@pytest.fixture
+def generation(monkeypatch):
+    """configure_generation(), undone after the test."""
+    monkeypatch.setattr(parallel, "_workers", 1)
+    monkeypatch.setattr(parallel, "_chunk_invoices", parallel.DEFAULT_CHUNK_INVOICES)
+    return configure_generation
+
+
+def decoded(records):
+    return [
+        dict(record, payload=json_io.loads(record["payload"])) if isinstance(record, EncodedRecord) else record
+        for record in records
+    ]
+
+
+def test_workers_generate_the_records_of_one_process(generation, deterministic_uuids):
+    sheet = make_sheet(invoices=40)
+    expected = ARInvoiceParser(sheet).parse()
+
+    generation(workers=2, chunk_invoices=7)
+    records = ARInvoiceParser(sheet).parse()
+
+    assert all(isinstance(record, EncodedRecord) for record in records)
+    assert decoded(records) == expected
+
+
+def test_one_chunk_is_generated_in_process(generation, sheet, deterministic_uuids):
+    generation(workers=2, chunk_invoices=len(sheet))
+
+    assert not any(isinstance(record, EncodedRecord) for record in ARInvoiceParser(sheet).parse())
+
+
+def test_random_uuids_of_workers_are_unique(generation):
+    generation(workers=2, chunk_invoices=5)
+    records = decoded(ARInvoiceParser(make_sheet(invoices=40)).parse())
+
+    uuids = [record["payload"]["validationUUID"] for record in records]
+    assert len(set(uuids)) == len(uuids) == 40
+
+
+def test_chunks_hold_at_least_one_invoice(generation):
+    with pytest.raises(ValueError):
+        generation(workers=2, chunk_invoices=0)
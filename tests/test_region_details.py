@@ -0,0 +1,131 @@
+from urllib.parse import urlencode
+import pytest
+from scripts import region_details
+from scripts.region_details import (
+    cache_stats, fetch_city_details, fetch_country_details, fetch_state_details, prefetch_countries, state_index
+)
+from utils.config_loader import load_config
+
+
+def test_first_lookup_of_a_process_reads_env(location_service):
+    assert fetch_country_details("IN") == {"iso2": "IN", "name": "India"}
+    assert fetch_state_details("NY", "US") == {"stateIso2": "NY", "name": "New York"}
+    assert fetch_city_details("Buffalo", "NY", "US") == {"name": "Buffalo"}
+
+
+def test_repeated_lookups_are_cached(location_service):
+    for _ in range(3):
+        fetch_country_details("US")
+        fetch_city_details("Bengaluru", "KA", "IN")
+        fetch_city_details("Mysuru", "KA", "IN")
+
+    assert location_service.count("country") == 1
+    assert location_service.count("city") == 2
+    assert cache_stats()["city"] == {"entries": 2, "hits": 4, "misses": 2, "evictions": 0}
+
+
+def test_blank_arguments_make_no_request(location_service):
+    assert fetch_country_details("") == {}
+    assert fetch_state_details("", "US") == {}
+    assert fetch_city_details("Buffalo", "NY", "") == {}
+    assert location_service.requests == []
+
+
+def test_unknown_city_is_empty(location_service):
+    assert fetch_city_details("Buff", "NY", "US") == {}
+
+
+def test_failed_lookups_are_not_cached(location_service, monkeypatch):
+    request_country = region_details._request_country
+    failures = [ValueError("service unavailable")]
+
+    def flaky(codes):
+        if failures:
+            raise failures.pop()
+        return request_country(codes)
+
+    monkeypatch.setattr(region_details, "_request_country", flaky)
+    with pytest.raises(ValueError):
+        fetch_country_details("IN")
+    assert fetch_country_details("IN") == {"iso2": "IN", "name": "India"}
+
+
+def test_prefetch_of_a_fresh_process_resolves_countries_in_one_request(location_service):
+    prefetch_countries(["IN", "AU|US", "IN"])
+
+    assert location_service.requests == [("country", {"_countryIso2": "IN|AU|US"})]
+    for code in ("IN", "AU", "US"):
+        assert fetch_country_details(code)["iso2"] == code
+    assert location_service.count("country") == 1
+
+
+def test_prefetch_batches_stay_within_the_url_length(location_service, monkeypatch):
+    monkeypatch.setitem(load_config()["locations"], "max_url_length", 60)
+    codes = ["IN", "AU", "US", "AE", "ZZ"]
+
+    prefetch_countries(codes)
+
+    batches = [params["_countryIso2"] for _, params in location_service.requests]
+    assert len(batches) > 1
+    assert "|".join(batches) == "|".join(codes)
+    for batch in batches:
+        url = location_service.env["COUNTRY_URL"] + "?" + urlencode({"_countryIso2": batch})
+        assert len(url) <= 60 or "|" not in batch
+    # a code the service does not know is asked for on its own, as without a prefetch
+    assert fetch_country_details("ZZ") == {}
+    assert location_service.count("country") == len(batches) + 1
+
+
+def test_prefetch_skips_cached_and_stored_countries(location_service):
+    fetch_country_details("IN")
+    prefetch_countries(["IN", "AU"])
+
+    assert location_service.requests[-1] == ("country", {"_countryIso2": "AU"})
+
+
+def test_codes_and_names_are_matched_exactly(location_service):
+    prefetch_countries(["us"])
+
+    assert fetch_state_details("ny", "US") == {}
+    assert fetch_city_details(" Buffalo", "NY", "US") == {}
+    assert fetch_country_details("us") == {}
+    assert location_service.requests[-1] == ("country", {"_countryIso2": "us"})
+
+
+def test_states_of_a_country_are_requested_once(location_service):
+    assert fetch_state_details("NY", "US")["name"] == "New York"
+    assert fetch_state_details("CA", "US")["name"] == "California"
+    assert fetch_state_details("TX", "US") == {}
+    assert fetch_state_details("KA", "IN")["name"] == "Karnataka"
+
+    assert location_service.requests == [("state", {"_countryIso2": "US"}), ("state", {"_countryIso2": "IN"})]
+
+
+def test_state_index_of_a_later_run_is_built_from_the_store(location_service, monkeypatch):
+    fetch_state_details("NY", "US")
+    monkeypatch.setattr(region_details, "_caches", {})
+
+    assert sorted(state_index("US")["by_code"]) == ["CA", "NY"]
+    assert location_service.count("state") == 1
+
+
+def test_state_names_are_matched_only_when_enabled(location_service, monkeypatch):
+    assert fetch_state_details("new  york", "US") == {}
+    assert fetch_state_details("new  york", "US", match_names=True)["stateIso2"] == "NY"
+
+    monkeypatch.setitem(load_config()["locations"], "match_state_names", True)
+    assert fetch_state_details("KARNATAKA", "IN")["stateIso2"] == "KA"
+    # a code always wins over a name
+    assert fetch_state_details("CA", "US")["name"] == "California"
+
+
+def test_first_of_duplicate_states_wins():
+    index = region_details._build_state_index([
+        {"stateIso2": "NY", "name": "New York"}, {"stateIso2": "NY", "name": "Other"},
+        {"stateIso2": "", "name": "New York"}, {"name": None},
+    ])
+
+    assert index["by_code"] == {"NY": {"stateIso2": "NY", "name": "New York"}}
+    assert index["by_name"] == {
+        "new york": {"stateIso2": "NY", "name": "New York"}, "other": {"stateIso2": "NY", "name": "Other"}
+    }
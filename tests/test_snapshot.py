@@ -0,0 +1,115 @@
+import pandas as pd
+import pytest
+from parser.AR_Parser import ARInvoiceParser
+from utils import json_io, uuid_provider
+from utils.snapshot import DocumentDiff, document_hash
+
+KEY = ARInvoiceParser.document_key
+
+
+@pytest.fixture
+def output_file(tmp_path):
+    return str(tmp_path / "AR_Invoice.json")
+
+
+def run(records, output_file, key_fields=KEY):
+    """The DocumentDiff of one run over `records` and the records it let through."""
+    diff = DocumentDiff(output_file, key_fields)
+    written = list(diff.filter(records))
+    diff.save()
+    return diff, written
+
+
+def parse(sheet):
+    return ARInvoiceParser(sheet).iter_parse()
+
+
+def keys(records):
+    return [tuple(record[field] for field in KEY) for record in records]
+
+
+def test_first_run_writes_everything(sheet, output_file):
+    expected = ARInvoiceParser(sheet).parse()
+
+    diff, written = run(parse(sheet), output_file)
+
+    assert keys(written) == keys(expected)
+    assert diff.counts == {"added": len(expected), "changed": 0, "unchanged": 0}
+    assert json_io.read_json(diff.removed_path) == []
+
+
+def test_rerun_writes_nothing(sheet, output_file):
+    run(parse(sheet), output_file)
+    # new random validationUUIDs are no change
+    diff, written = run(parse(sheet), output_file)
+
+    assert written == []
+    assert diff.counts["unchanged"] == sheet.groupby(["LEGAL_ENTITY", "Invoice Number"]).ngroups
+
+
+def test_added_changed_and_removed_documents(sheet, output_file):
+    run(parse(sheet), output_file)
+
+    added = sheet[sheet["Invoice Number"].isin(["INV000", "INV001"])].replace({"INV000": "INV100", "INV001": "INV101"})
+    sheet.loc[sheet["Invoice Number"] == "INV003", "Customer"] = "C99"
+    sheet = pd.concat([sheet[sheet["Invoice Number"] != "INV004"], added], ignore_index=True)
+    diff, written = run(parse(sheet), output_file)
+
+    assert sorted(keys(written)) == [("LE01", "INV100"), ("LE02", "INV003"), ("LE02", "INV101")]
+    assert diff.counts["added"] == 2
+    assert diff.counts["changed"] == 1
+    assert json_io.read_json(diff.removed_path) == [{"legal_entity": "LE01", "invoice_number": "INV004"}]
+
+    # the snapshot now holds the second run, against which a rerun is unchanged
+    diff, written = run(parse(sheet), output_file)
+    assert written == []
+    assert json_io.read_json(diff.removed_path) == []
+
+
+def test_repeated_keys_are_told_apart_by_occurrence(output_file):
+    records = [
+        {"legal_entity": "LE01", "invoice_number": "INV1", "payload": {"amount": amount}} for amount in (1, 2)
+    ]
+    run(records, output_file)
+
+    records[1]["payload"]["amount"] = 3
+    diff, written = run(records, output_file)
+
+    assert written == [records[1]]
+    assert diff.counts == {"added": 0, "changed": 1, "unchanged": 1}
+
+
+def test_other_key_fields_write_everything(sheet, output_file):
+    run(parse(sheet), output_file)
+
+    diff, written = run(parse(sheet), output_file, key_fields=("invoice_number",))
+
+    assert diff.counts["added"] == len(written) > 0
+
+
+def test_corrupt_snapshot_writes_everything(sheet, output_file):
+    diff, _ = run(parse(sheet), output_file)
+    with open(diff.snapshot_path, "w") as f:
+        f.write("{")
+
+    diff, written = run(parse(sheet), output_file)
+
+    assert diff.counts["added"] == len(written) > 0
+
+
+def test_hash_ignores_validation_uuids():
+    payload = {"validationUUID": uuid_provider.RandomUUIDs().new(), "lines": [{"validationUUID": "x", "qty": "1"}]}
+    other = {"validationUUID": "y", "lines": [{"validationUUID": "z", "qty": "1"}]}
+
+    assert document_hash(payload) == document_hash(other)
+    assert document_hash(payload) == document_hash(json_io.dumpb(payload, pretty=False))
+    assert document_hash(payload) != document_hash({**other, "lines": [{"validationUUID": "z", "qty": "2"}]})
+
+
+def test_hash_does_not_depend_on_the_json_backend(monkeypatch):
+    payload = {"name": "Zürich", "amount": 1e20, "lines": [{"validationUUID": "x", "qty": "1"}]}
+    hashes = {document_hash(payload), document_hash(json_io.dumpb(payload, pretty=False))}
+    monkeypatch.setattr(json_io, "orjson", None)
+    hashes |= {document_hash(payload), document_hash(json_io.dumpb(payload, pretty=False))}
+
+    assert len(hashes) == 1
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+import main
+from conftest import with_blank_cells, write_workbook
+from utils import staging
+from utils.excel_reader import iter_sheet_chunks
+from utils.staging import SheetCache
+
+
+@pytest.fixture(params=["parquet", "pickle"])
+def cache(request, tmp_path, monkeypatch):
+    if request.param == "pickle":
+        monkeypatch.setattr(staging, "pa", None)
+        monkeypatch.setattr(staging, "pq", None)
+    elif not staging.pq:
+        pytest.skip("pyarrow is not installed")
+    return SheetCache(str(tmp_path / "staging"))
+
+
+@pytest.fixture
+def workbook(tmp_path, sheet):
+    return write_workbook(tmp_path / "invoices.xlsx", {"AR_Invoice": with_blank_cells(sheet)})
+
+
+class Counting:
+    """A loader that counts its calls, staged under the name of the loader it wraps."""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.__name__ = loader.__name__
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        return self.loader(*args)
+
+
+def test_staged_sheet_equals_the_read_one(cache, workbook):
+    read_sheet = Counting(main.read_sheet)
+
+    first = cache.load(workbook, "AR_Invoice", read_sheet)
+    staged = cache.load(workbook, "AR_Invoice", read_sheet)
+
+    assert read_sheet.calls == 1
+    pd.testing.assert_frame_equal(staged.astype(object), first.astype(object))
+    assert staged["row_number"].dtype == np.int64
+
+
+def test_staged_chunks_equal_the_read_ones(cache, workbook):
+    read_chunks = Counting(iter_sheet_chunks)
+
+    first = list(cache.iter_chunks(workbook, "AR_Invoice", 5, read_chunks))
+    staged = list(cache.iter_chunks(workbook, "AR_Invoice", 5, read_chunks))
+
+    # without pyarrow chunks are passed through, not staged
+    assert read_chunks.calls == (1 if staging.pq else 2)
+    assert [len(chunk) for chunk in staged] == [len(chunk) for chunk in first]
+    pd.testing.assert_frame_equal(
+        pd.concat(staged, ignore_index=True).astype(object), pd.concat(first, ignore_index=True).astype(object)
+    )
+
+
+def test_readers_are_staged_separately(cache, workbook):
+    def read_sheet(file_path, sheet_name):
+        return pd.DataFrame({"source": ["whole sheet"], "row_number": [0]})
+
+    def iter_sheet_chunks(file_path, sheet_name, chunk_size):
+        yield pd.DataFrame({"source": ["chunks"], "row_number": [0]})
+
+    list(cache.iter_chunks(workbook, "AR_Invoice", 10, iter_sheet_chunks))
+
+    assert cache.load(workbook, "AR_Invoice", read_sheet)["source"].tolist() == ["whole sheet"]
+    chunks = list(cache.iter_chunks(workbook, "AR_Invoice", 10, iter_sheet_chunks))
+    assert chunks[0]["source"].tolist() == ["chunks"]
+
+
+def test_changed_workbook_is_read_again(cache, tmp_path, sheet, monkeypatch):
+    path = tmp_path / "book.xlsx"
+    write_workbook(path, {"AR_Invoice": sheet})
+    read_sheet = Counting(main.read_sheet)
+    cache.load(str(path), "AR_Invoice", read_sheet)
+
+    write_workbook(path, {"AR_Invoice": sheet.iloc[:5]})
+    # main keeps a workbook open for the run, a changed one is seen by the next run
+    monkeypatch.setattr(main, "_open_workbooks", {})
+
+    assert len(cache.load(str(path), "AR_Invoice", read_sheet)) == 5
+    assert read_sheet.calls == 2
+
+
+def test_abandoned_stream_stages_nothing(cache, workbook):
+    read_chunks = Counting(iter_sheet_chunks)
+    next(cache.iter_chunks(workbook, "AR_Invoice", 5, read_chunks))
+
+    list(cache.iter_chunks(workbook, "AR_Invoice", 5, read_chunks))
+
+    assert read_chunks.calls == 2
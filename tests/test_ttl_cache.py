@@ -0,0 +1,53 @@
+import pytest
+from utils.ttl_cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2, ttl=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get_or_load("a", lambda: pytest.fail("a is cached"))
+    cache.put("c", 3)
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 0, "evictions": 1}
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = TTLCache(ttl=10, clock=clock)
+    loads = []
+
+    def load():
+        loads.append(clock.now)
+        return len(loads)
+
+    assert cache.get_or_load("key", load) == 1
+    clock.now = 9.9
+    assert cache.get_or_load("key", load) == 1
+    clock.now = 10.0
+    assert "key" not in cache
+    assert cache.get_or_load("key", load) == 2
+    assert loads == [0.0, 10.0]
+
+
+def test_errors_are_not_cached():
+    cache = TTLCache()
+    with pytest.raises(KeyError):
+        cache.get_or_load("key", lambda: {}["missing"])
+
+    assert cache.get_or_load("key", lambda: "loaded") == "loaded"
+    assert cache.stats()["misses"] == 2
+
+
+def test_at_least_one_entry():
+    with pytest.raises(ValueError):
+        TTLCache(max_entries=0)
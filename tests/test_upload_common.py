@@ -0,0 +1,29 @@
+import sys
+import pytest
+from scripts.upload_common import parse_upload_args, select_output
+from utils.config_loader import load_config
+
+
+def parse(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["upload", *argv])
+    return parse_upload_args("Upload payloads.", "AR_Invoice.json")
+
+
+def test_rows_select_payloads_of_a_sheet_output(monkeypatch):
+    args = parse(monkeypatch, "--row", "3", "--row", "7")
+
+    assert (args.output, args.rows) == ("AR_Invoice.json", [3, 7])
+
+
+def test_rows_are_rejected_for_grouped_outputs(monkeypatch):
+    assert parse(monkeypatch, "--output", "Grouped_AR_Invoice.json").rows is None
+    with pytest.raises(SystemExit):
+        parse(monkeypatch, "--output", "Grouped_AR_Invoice.json", "--row", "3")
+
+
+def test_outputs_are_selected_from_the_configured_output_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(load_config()["paths"], "output_dir", str(tmp_path))
+    (tmp_path / "AR_Invoice.json.gz").write_bytes(b"")
+
+    assert select_output("AR_Invoice.json") == (str(tmp_path / "AR_Invoice.json.gz"), "AR_Invoice.json")
+    assert select_output("AP_Invoice.json") == (str(tmp_path / "AP_Invoice.json"), "AP_Invoice.json")
@@ -0,0 +1,77 @@
+import uuid
+import pandas as pd
+import pytest
+from parser.AR_Parser import ARInvoiceParser
+from utils import uuid_provider
+from utils.excel_reader import SPLIT_PART_COLUMN, iter_group_aligned_chunks
+from utils.uuid_provider import (
+    VALIDATION_NAMESPACE, BulkRandomUUIDs, DeterministicUUIDs, RandomUUIDs, make_uuid_provider
+)
+
+KEYS = ARInvoiceParser.group_keys
+
+
+@pytest.mark.parametrize("parts", [("AR_Invoice", "LE01", "INV1", "validationUUID"), ("ünïcode", ""), ()])
+def test_deterministic_uuid_is_uuid5_of_the_joined_parts(parts):
+    expected = str(uuid.uuid5(VALIDATION_NAMESPACE, "\x1f".join(parts)))
+
+    assert DeterministicUUIDs().derive(*parts) == expected
+    assert DeterministicUUIDs().derive(*parts) == expected
+
+
+def test_deterministic_uuids_depend_on_namespace_and_parts():
+    provider = DeterministicUUIDs()
+
+    assert provider.derive("a", "b") != provider.derive("ab")
+    assert DeterministicUUIDs(uuid.uuid4()).derive("a") != provider.derive("a")
+    with pytest.raises(ValueError):
+        provider.new()
+
+
+@pytest.mark.parametrize("provider", [RandomUUIDs(), BulkRandomUUIDs(block_size=64)], ids=["random", "bulk"])
+def test_random_uuids_are_unique_version_4(provider):
+    values = [provider.new() for _ in range(1000)]
+
+    assert len(set(values)) == len(values)
+    for value in values:
+        parsed = uuid.UUID(value)
+        assert str(parsed) == value
+        assert parsed.version == 4
+        assert parsed.variant == uuid.RFC_4122
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        make_uuid_provider("sequential")
+
+
+def header_uuids(records):
+    return [record["payload"]["validationUUID"] for record in records]
+
+
+def test_deterministic_payloads_are_stable(sheet, deterministic_uuids, monkeypatch):
+    first = ARInvoiceParser(sheet).parse()
+    # as in a later run, with a provider of its own
+    monkeypatch.setattr(uuid_provider, "_provider", DeterministicUUIDs())
+    second = ARInvoiceParser(sheet.copy()).parse()
+
+    assert [record["payload"] for record in first] == [record["payload"] for record in second]
+    assert len(set(header_uuids(first))) == len(first)
+
+
+def test_split_invoice_parts_get_their_own_uuids(sheet, deterministic_uuids):
+    contiguous = sheet.sort_values(KEYS + ["row_number"], ignore_index=True)
+    # another line of INV002 and of INV005 after all others: the first is emitted
+    # with a later chunk, the second with the rows left over at the end
+    extra = contiguous[contiguous["Invoice Number"].isin(["INV002", "INV005"])].drop_duplicates(KEYS)
+    extra = extra.assign(row_number=range(len(sheet), len(sheet) + 2))
+    split = pd.concat([contiguous, extra], ignore_index=True)
+
+    chunks = list(iter_group_aligned_chunks((split.iloc[i:i + 4] for i in range(0, len(split), 4)), KEYS))
+    records = [record for chunk in chunks for record in ARInvoiceParser(chunk).parse()]
+
+    assert sorted(chunk[SPLIT_PART_COLUMN].max() for chunk in chunks if SPLIT_PART_COLUMN in chunk) == [1, 1]
+    assert len(records) == len(ARInvoiceParser(sheet).parse()) + 2
+    assert len(set(header_uuids(records))) == len(records)
+    # the first part of every invoice keeps the UUIDs of an unsplit sheet
+    assert set(header_uuids(ARInvoiceParser(contiguous).parse())) <= set(header_uuids(records))
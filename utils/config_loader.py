@@ -1,5 +1,18 @@
+import os
 import yaml
 
-def load_config():
-    with open("./config/config.yaml", "r") as f:
-        return yaml.safe_load(f)
\ No newline at end of file
+CONFIG_PATH = "./config/config.yaml"
+
+_configs = {}
+
+
+def load_config(path=CONFIG_PATH):
+    """
+    The parsed configuration. The file is read once per process; every
+    later call returns the same dict, so callers must not modify it.
+    """
+    path = os.path.abspath(path)
+    if path not in _configs:
+        with open(path, "r") as f:
+            _configs[path] = yaml.safe_load(f)
+    return _configs[path]
\ No newline at end of file
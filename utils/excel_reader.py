@@ -0,0 +1,197 @@
+from utils.lazy_import import lazy_import
+from utils.logger import get_logger
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+openpyxl = lazy_import("openpyxl")
+
+logger = get_logger()
+
+DEFAULT_CHUNK_SIZE = 5000
+# compact_frame() stores a text column as a categorical when it has at most
+# this many distinct values per row
+DEFAULT_CATEGORY_RATIO = 0.5
+# Column iter_group_aligned_chunks() adds to the rows of the second, third...
+# part of a group split in the sheet: 1, 2... (0 for every other row)
+SPLIT_PART_COLUMN = "_split_part"
+
+
+def get_sheet_names(file_path):
+    """Return the sheet names of a workbook without loading any cell data."""
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def _na_values():
+    """The strings `xl.parse` reads as missing by default ("", "N/A", "NULL", "nan"...)."""
+    return frozenset(pd._libs.parsers.STR_NA_VALUES)
+
+
+def _cell_to_str(value, na_values):
+    """Convert a cell the same way `xl.parse(sheet_name, dtype=str)` does."""
+    if value is None:
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value)
+    return np.nan if value in na_values else value
+
+
+def _build_header(row):
+    """Strip column names, name blank headers and de-duplicate like pandas."""
+    columns = []
+    seen = {}
+    for i, name in enumerate(row):
+        name = f"Unnamed: {i}" if name is None else str(name).strip()
+        base = name
+        while name in seen:
+            seen[base] += 1
+            name = f"{base}.{seen[base]}"
+        seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def iter_sheet_chunks(file_path, sheet_name, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream a sheet as DataFrames of at most `chunk_size` rows.
+
+    Rows are read with openpyxl's read-only iterator, so only one chunk is
+    held in memory at a time. The chunks together equal what `main.read_sheet`
+    builds from `xl.parse(sheet_name, dtype=str)`: cells are converted to
+    strings, pandas' default NA strings become NaN, blank rows within the
+    sheet are kept as all-NaN rows while trailing ones are dropped, and every
+    chunk carries a global `row_number` column.
+    """
+    na_values = _na_values()
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _build_header(header)
+        width = len(columns)
+
+        buffer = []
+        blank_rows = 0  # blank rows not followed by data yet
+        row_number = 0
+        for row in rows:
+            values = [_cell_to_str(v, na_values) for v in row[:width]]
+            if all(v is np.nan for v in values):
+                blank_rows += 1
+                continue
+            for _ in range(blank_rows):
+                buffer.append([np.nan] * width + [row_number])
+                row_number += 1
+            blank_rows = 0
+            values.extend([np.nan] * (width - len(values)))
+            values.append(row_number)
+            buffer.append(values)
+            row_number += 1
+
+            while len(buffer) >= chunk_size:
+                yield _to_frame(buffer[:chunk_size], columns)
+                buffer = buffer[chunk_size:]
+
+        if buffer:
+            yield _to_frame(buffer, columns)
+    finally:
+        wb.close()
+
+
+def _to_frame(rows, columns):
+    df = pd.DataFrame(rows, columns=columns + ["row_number"], dtype=object)
+    df["row_number"] = df["row_number"].astype("int64")
+    return df
+
+
+def compact_frame(df, max_ratio=DEFAULT_CATEGORY_RATIO):
+    """
+    Return `df` with every text column that has at most `max_ratio` distinct
+    values per row stored as a categorical.
+
+    Columns such as LEGAL_ENTITY, Currency, UOM or Tax Rule repeat a handful
+    of values on every row, so one small code per cell replaces a string
+    object per cell. Missing cells stay missing. Other columns are unchanged.
+    """
+    converted = {}
+    for column in df.columns:
+        series = df[column]
+        if not (series.dtype == object or pd.api.types.is_string_dtype(series.dtype)):
+            continue
+        codes, uniques = pd.factorize(series)
+        if len(uniques) > max_ratio * len(series):
+            continue
+        converted[column] = pd.Series(
+            pd.Categorical.from_codes(codes, pd.Index(uniques, dtype=object)), index=df.index
+        )
+    return df.assign(**converted) if converted else df
+
+
+def iter_group_aligned_chunks(chunks, keys):
+    """
+    Re-cut a stream of chunks so that no group keyed by `keys` spans two chunks.
+
+    Rows of the group that is still open at the end of a chunk (the key of its
+    last row) are carried over into the next chunk. This assumes the lines of an
+    invoice are contiguous in the sheet; a key that shows up again after its
+    group was already emitted is logged, since it will produce a second payload.
+    The rows of such later parts are numbered in SPLIT_PART_COLUMN, so that
+    deterministic validationUUIDs of the parts differ.
+
+    Spotting those needs every key emitted so far, so unlike the rows this
+    keeps O(invoices) memory: one hash per key, under 100 bytes each.
+
+    Groups come out in sheet order of their chunk, each chunk sorted by key,
+    whereas a whole-sheet parse sorts all groups by key. Streamed output
+    holds the same documents, possibly in a different order.
+    """
+    carry = None
+    # hash(key) of every emitted group -> parts emitted so far; colliding keys
+    # would only cause a spurious warning and part number
+    emitted = {}
+
+    def emit(ready):
+        parts = {}
+        for key in ready[keys].drop_duplicates().itertuples(index=False, name=None):
+            key_hash = hash(key)
+            part = emitted.get(key_hash, 0)
+            if part == 1:
+                logger.warning(f"Group {key} is not contiguous in the sheet and will be split")
+            if part:
+                parts[key] = part
+            emitted[key_hash] = part + 1
+        if parts:
+            ready = ready.assign(**{SPLIT_PART_COLUMN: [
+                parts.get(key, 0) for key in ready[keys].itertuples(index=False, name=None)
+            ]})
+        return ready.reset_index(drop=True)
+
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+
+        # Rows without a complete key are dropped by groupby in the parsers anyway
+        chunk = chunk[chunk[keys].notna().all(axis=1)]
+        if chunk.empty:
+            carry = None
+            continue
+
+        key_frame = chunk[keys]
+        last_key = tuple(key_frame.iloc[-1])
+        is_open = np.logical_and.reduce(
+            [(key_frame[k] == v).to_numpy() for k, v in zip(keys, last_key)]
+        )
+
+        ready = chunk[~is_open]
+        carry = chunk[is_open]
+
+        if not ready.empty:
+            yield emit(ready)
+
+    if carry is not None and not carry.empty:
+        yield emit(carry)
@@ -0,0 +1,79 @@
+"""
+JSON serialization for every file the project reads or writes.
+
+Output is compact unless pretty output is requested, either per call or for
+the whole process with set_pretty().
+
+Pretty output always comes from the stdlib encoder, so it is byte-identical
+to `json.dumps(obj, indent=2)` (non-ASCII characters escaped). Compact output
+uses orjson when it is installed and the stdlib otherwise; the two decode to
+the same values but differ in bytes: orjson writes non-ASCII characters as
+raw UTF-8 and floats like 1e20 without the "+" of the exponent.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib json module is the fallback
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+# orjson.JSONDecodeError is a subclass, so one except clause covers both backends
+JSONDecodeError = json.JSONDecodeError
+
+_pretty = False
+
+
+def set_pretty(enabled):
+    """Make pretty (2-space indented) output the default for this process."""
+    global _pretty
+    _pretty = bool(enabled)
+
+
+def is_pretty():
+    return _pretty
+
+
+def dumps(obj, pretty=None, sort_keys=False):
+    if pretty is None:
+        pretty = _pretty
+    if pretty:
+        return json.dumps(obj, indent=2, sort_keys=sort_keys)
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0).decode()
+    return json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys)
+
+
+def dumpb(obj, pretty=None, sort_keys=False):
+    """dumps() encoded as UTF-8, without a round trip through str on orjson."""
+    if pretty is None:
+        pretty = _pretty
+    if orjson is not None and not pretty:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return dumps(obj, pretty=pretty, sort_keys=sort_keys).encode("utf-8")
+
+
+def loads(data):
+    """Parse a str or UTF-8 bytes document."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load(f):
+    return loads(f.read())
+
+
+def dump(obj, f, pretty=None, sort_keys=False):
+    f.write(dumps(obj, pretty=pretty, sort_keys=sort_keys))
+
+
+def read_json(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def write_json(path, obj, pretty=None, sort_keys=False):
+    with open(path, "w", encoding="utf-8") as f:
+        dump(obj, f, pretty=pretty, sort_keys=sort_keys)
@@ -0,0 +1,35 @@
+import importlib
+import importlib.util
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access, so that
+    modules only needing pandas, numpy or openpyxl for actual sheet work can
+    be imported (for --help, up-to-date runs...) without paying for them.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_lazy_name"] = name
+
+    def _load(self):
+        module = importlib.import_module(self._lazy_name)
+        # later lookups hit the instance dict and skip __getattr__
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        return f"<lazy module {self._lazy_name!r}>"
+
+
+def lazy_import(name, optional=False):
+    """
+    A LazyModule for `name`. With optional=True, None when the top-level
+    package is not installed, like the try/except ImportError it replaces.
+    """
+    if optional and importlib.util.find_spec(name.partition(".")[0]) is None:
+        return None
+    return LazyModule(name)
@@ -0,0 +1,127 @@
+"""
+Local store of location service responses (countries, states, cities).
+
+Lookups are kept in one SQLite table keyed by kind and normalized
+arguments, with the time they were fetched, so later runs and other
+processes can reuse them instead of calling the service again.
+"""
+import os
+import time
+import sqlite3
+from utils import json_io
+from utils.config_loader import load_config
+
+DEFAULT_STORE_PATH = "data/locations.sqlite"
+DEFAULT_REFRESH_AFTER_DAYS = 30
+
+_KEY_SEPARATOR = "\x1f"
+_settings = None
+
+
+def _key(key):
+    return _KEY_SEPARATOR.join(key) if isinstance(key, tuple) else key
+
+
+class LocationStore:
+    """
+    SQLite file of (kind, key) -> response, safe to share between the sheet
+    worker processes. The connection is opened on first use in each process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        # a connection must not be used across fork
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS lookups ("
+                "kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (kind, key))"
+            )
+            self._connection.commit()
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, kind, key, max_age=None):
+        """
+        The stored response and its age in seconds, or (None, None) when there
+        is none or, with `max_age` seconds, when it is older than that.
+        """
+        row = self._connect().execute(
+            "SELECT value, fetched_at FROM lookups WHERE kind = ? AND key = ?", (kind, _key(key))
+        ).fetchone()
+        if row is None:
+            return None, None
+        age = time.time() - row[1]
+        if max_age is not None and age > max_age:
+            return None, age
+        return json_io.loads(row[0]), age
+
+    def put(self, kind, key, value):
+        connection = self._connect()
+        connection.execute(
+            "INSERT OR REPLACE INTO lookups (kind, key, value, fetched_at) VALUES (?, ?, ?, ?)",
+            (kind, _key(key), json_io.dumps(value, pretty=False), time.time()),
+        )
+        connection.commit()
+
+    def put_many(self, kind, items):
+        """Store (key, value) pairs in one transaction."""
+        fetched_at = time.time()
+        connection = self._connect()
+        connection.executemany(
+            "INSERT OR REPLACE INTO lookups (kind, key, value, fetched_at) VALUES (?, ?, ?, ?)",
+            [(kind, _key(key), json_io.dumps(value, pretty=False), fetched_at) for key, value in items],
+        )
+        connection.commit()
+
+    def count(self, kind=None):
+        if kind is None:
+            return self._connect().execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+        return self._connect().execute("SELECT COUNT(*) FROM lookups WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+def configure_locations(offline=None, refresh_after_days=None, store_path=None):
+    """
+    Set how region lookups use the store for this process; None keeps the
+    value of the locations section of the config. An empty store path
+    disables the store. Offline lookups never call the location service:
+    they use stored responses of any age and fail when there is none.
+    """
+    global _settings
+    settings = load_config().get("locations", {})
+    if offline is None:
+        offline = settings.get("offline", False)
+    if refresh_after_days is None:
+        refresh_after_days = settings.get("refresh_after_days", DEFAULT_REFRESH_AFTER_DAYS)
+    if store_path is None:
+        store_path = settings.get("store", DEFAULT_STORE_PATH)
+
+    store = _settings["store"] if _settings else None
+    if store is None or store.path != store_path:
+        store = LocationStore(store_path) if store_path else None
+    _settings = {
+        "store": store,
+        "offline": bool(offline),
+        # refresh_after_days: null keeps stored responses forever
+        "refresh_after": None if refresh_after_days is None else refresh_after_days * 86400,
+    }
+    return _settings
+
+
+def location_settings():
+    """The store, offline flag and refresh age (seconds) set by configure_locations()."""
+    return _settings or configure_locations()
@@ -2,8 +2,8 @@ import logging
 import os
 from datetime import datetime
 import time
-import json
 import threading
+from utils import json_io
 
 _LOGGER = None  # Singleton logger instance
 
@@ -59,13 +59,13 @@ class CustomLogger:
         if os.path.exists(self.file_path):
             with open(self.file_path, "r", encoding="utf-8") as f:
                 try:
-                    existing_data = json.load(f)
+                    existing_data = json_io.load(f)
                     # We only load existing data on startup. New logs will be appended to buffer.
                     # If you need to *also* preserve old data and new data in the same file,
                     # you'll need to decide how to merge or keep them distinct.
                     # For simplicity here, assume _log_buffer starts fresh for *new* entries.
                     # A more robust solution might load existing_data into _log_buffer initially.
-                except json.JSONDecodeError:
+                except json_io.JSONDecodeError:
                     pass # File exists but is empty or malformed, start with empty buffer
 
     def start_auto_flush(self):
@@ -111,14 +111,14 @@ class CustomLogger:
         if os.path.exists(self.file_path):
             with open(self.file_path, "r", encoding="utf-8") as f:
                 try:
-                    existing_data = json.load(f)
-                except json.JSONDecodeError:
+                    existing_data = json_io.load(f)
+                except json_io.JSONDecodeError:
                     pass # File exists but is empty or malformed
 
         existing_data.extend(entries_to_write)
 
         with open(self.file_path, "w", encoding="utf-8") as f:
-            json.dump(existing_data, f, indent=2)
+            json_io.dump(existing_data, f)
         print(f"Flushed {len(entries_to_write)} entries to {self.file_path}")
 
 
@@ -0,0 +1,100 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+from utils import json_io
+from utils.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+# Bump whenever a change to the parsers or payload generators changes their output,
+# so that outputs written by an older version are regenerated
+GENERATOR_VERSION = "3"
+
+
+def config_hash(config):
+    """Hash of the configuration that affects payload content."""
+    relevant = {
+        "segment_mapping": config.get("segment_mapping"),
+        "coa_code": config.get("coa_code"),
+    }
+    # hashes use the stdlib encoder so that they do not depend on the json_io backend
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+
+
+class SheetHasher:
+    """
+    Content hash of a sheet that does not depend on how it was chunked or on
+    the dtype it was loaded with (object, str or a staged Parquet column).
+    """
+
+    def __init__(self):
+        self._digest = hashlib.sha256()
+        self._columns = None
+
+    def update(self, df):
+        if self._columns is None:
+            self._columns = list(df.columns)
+            self._digest.update(json.dumps(self._columns).encode())
+        self._digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+def sheet_hash(df):
+    hasher = SheetHasher()
+    hasher.update(df)
+    return hasher.hexdigest()
+
+
+# Fingerprint fields that must match for an output to be reused
+WORKBOOK_FIELDS = ("workbook_hash", "generator_version", "config_hash", "options")
+SHEET_FIELDS = ("sheet_hash", "generator_version", "config_hash", "options")
+
+
+def is_up_to_date(entry, output_file, fingerprint, fields):
+    """
+    True when `output_file` still exists and its manifest entry matches
+    `fingerprint` on `fields`. WORKBOOK_FIELDS allows skipping a sheet
+    without reading it, SHEET_FIELDS still matches when only other tabs of
+    the workbook were edited.
+    """
+    if not entry or not os.path.exists(output_file):
+        return False
+    return all(entry.get(field) == fingerprint.get(field) for field in fields)
+
+
+class RunManifest:
+    """
+    Record of what produced every output file, stored as JSON in the output
+    directory and keyed by output file name.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                try:
+                    self.entries = json_io.load(f)
+                except json_io.JSONDecodeError:
+                    pass  # corrupt manifest, everything gets regenerated
+
+    def get(self, output_file):
+        return self.entries.get(os.path.basename(output_file))
+
+    def record(self, output_file, fingerprint, regenerated=True):
+        previous = self.get(output_file) or {}
+        entry = dict(fingerprint)
+        if regenerated or "generated_at" not in previous:
+            entry["generated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            entry["generated_at"] = previous["generated_at"]
+        self.entries[os.path.basename(output_file)] = entry
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json_io.dump(self.entries, f, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,449 @@
+import os
+import gzip
+import glob
+import zlib
+import itertools
+from utils import json_io
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for zstd compressed output
+    zstandard = None
+
+# compression name -> file name suffix
+COMPRESSIONS = {
+    "none": "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+
+def compression_of(file_path):
+    for name, suffix in COMPRESSIONS.items():
+        if suffix and file_path.endswith(suffix):
+            return name
+    return "none"
+
+
+def check_compression(compression):
+    """Raise ValueError if `compression` is unknown or its package is not installed."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("zstd compression needs the zstandard package (pip install zstandard)")
+
+
+def open_binary(file_path, mode="r", compression=None):
+    """
+    Open `file_path` in binary mode "r" or "w", compressing or decompressing
+    as a stream. The compression is taken from the file name unless given.
+    """
+    compression = compression or compression_of(file_path)
+    check_compression(compression)
+    if compression == "gzip":
+        return gzip.open(file_path, mode + "b", compresslevel=6)
+    if compression == "zstd":
+        return zstandard.open(file_path, mode + "b")
+    return open(file_path, mode + "b")
+
+
+def open_text(file_path, mode="r", compression=None):
+    """open_binary() as UTF-8 text."""
+    compression = compression or compression_of(file_path)
+    check_compression(compression)
+    if compression == "gzip":
+        return gzip.open(file_path, mode + "t", encoding="utf-8", compresslevel=6)
+    if compression == "zstd":
+        return zstandard.open(file_path, mode + "t", encoding="utf-8")
+    return open(file_path, mode, encoding="utf-8")
+
+
+OFFSET_INDEX_SUFFIX = ".idx"
+
+
+class EncodedRecord(dict):
+    """
+    Output record whose payload was already encoded, e.g. in a worker process:
+    `record["payload"]` holds compact JSON bytes, the other fields are plain
+    values. Writers splice the bytes in instead of encoding the payload again.
+    """
+
+
+def encode_record(record, pretty=False):
+    """The JSON bytes of an output record, as `json_io.dumpb(record, pretty)`."""
+    if isinstance(record, EncodedRecord):
+        if not pretty:
+            return b"{" + b",".join(
+                json_io.dumpb(key) + b":" + (value if key == "payload" else json_io.dumpb(value, pretty=False))
+                for key, value in record.items()
+            ) + b"}"
+        record = dict(record, payload=json_io.loads(record["payload"]))
+    return json_io.dumpb(record, pretty=pretty)
+
+
+class _RecordWriter:
+    """
+    Base for writers that emit records one at a time. Output goes to a
+    temporary file that only replaces `file_path` once the writer is closed
+    without an error, so a failed sheet never leaves a truncated file behind.
+
+    With `index_fields`, a sidecar `<file_path>.idx` is written next to the
+    output: one JSON line per record with the byte offset and length of the
+    record in the (uncompressed) output and the record's `index_fields`.
+    See OffsetIndex.
+    """
+
+    def __init__(self, file_path, compression="none", index_fields=None):
+        self.file_path = file_path
+        self.compression = compression
+        self.index_fields = index_fields
+        self.count = 0
+        self._file = None
+        self._index = None
+        self._offset = 0
+        self._tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        self._index_path = file_path + OFFSET_INDEX_SUFFIX
+        self._index_tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+
+    def __enter__(self):
+        self._file = open_binary(self._tmp_path, "w", self.compression)
+        if self.index_fields is not None:
+            self._index = open(self._index_tmp_path, "wb")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, record):
+        raise NotImplementedError
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def _emit(self, prefix, body, suffix, record):
+        """Write one record's bytes, framed by `prefix` and `suffix`, and index it."""
+        self._file.write(prefix + body + suffix)
+        if self._index is not None:
+            entry = {"offset": self._offset + len(prefix), "length": len(body)}
+            for field in self.index_fields:
+                entry[field] = record.get(field)
+            self._index.write(json_io.dumpb(entry, pretty=False) + b"\n")
+        self._offset += len(prefix) + len(body) + len(suffix)
+        self.count += 1
+
+    def _finish(self):
+        """Write whatever closes the document."""
+
+    def close(self):
+        if self._file is None:
+            return
+        self._finish()
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.file_path)
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+            os.replace(self._index_tmp_path, self._index_path)
+        elif os.path.exists(self._index_path):
+            # an index from an earlier run no longer matches the output
+            os.remove(self._index_path)
+
+    def discard(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        os.remove(self._tmp_path)
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+            os.remove(self._index_tmp_path)
+
+
+class JsonArrayWriter(_RecordWriter):
+    """
+    Write a JSON array one element at a time, so records can be written as
+    they are produced instead of being collected into one list first.
+
+    Each element is compact and on its own line. With `pretty` the file
+    matches `json.dump(records, f, indent=2)`.
+    """
+
+    def __init__(self, file_path, compression="none", index_fields=None, pretty=None):
+        super().__init__(file_path, compression, index_fields)
+        self.pretty = json_io.is_pretty() if pretty is None else pretty
+
+    def write(self, record):
+        body = encode_record(record, pretty=self.pretty)
+        if self.pretty:
+            body = b"  " + body.replace(b"\n", b"\n  ")
+        self._emit(b"[\n" if self.count == 0 else b",\n", body, b"", record)
+
+    def _finish(self):
+        self._file.write(b"[]" if self.count == 0 else b"\n]")
+
+
+class JsonLinesWriter(_RecordWriter):
+    """Write one compact JSON document per line as records are produced."""
+
+    def write(self, record):
+        self._emit(b"", encode_record(record), b"\n", record)
+
+
+OUTPUT_FORMATS = {
+    "json": (".json", JsonArrayWriter),
+    "jsonl": (".jsonl", JsonLinesWriter),
+}
+
+
+SHARD_INDEX_SUFFIX = ".shards.json"
+
+
+def shard_of(key, shards):
+    """Shard number of `key`, stable across processes and runs (unlike hash())."""
+    return zlib.crc32(str(key).encode("utf-8")) % shards
+
+
+def _strip_suffixes(file_path):
+    """`file_path` without its compression suffix and output format extension."""
+    suffix = COMPRESSIONS[compression_of(file_path)]
+    if suffix:
+        file_path = file_path[:-len(suffix)]
+    return os.path.splitext(file_path)[0]
+
+
+def shard_index_path(file_path):
+    """Index of the sharded variant of the output `file_path`."""
+    return _strip_suffixes(file_path) + SHARD_INDEX_SUFFIX
+
+
+def sidecar_path(file_path, suffix):
+    """
+    File next to the output `file_path` (or its shard index) that shares its
+    base name, e.g. <base>.snapshot.json for "<base>.json.gz".
+    """
+    if file_path.endswith(SHARD_INDEX_SUFFIX):
+        return file_path[:-len(SHARD_INDEX_SUFFIX)] + suffix
+    return _strip_suffixes(file_path) + suffix
+
+
+def shard_file(file_path, shard):
+    """Path of shard number `shard` of the output `file_path`, read from its index."""
+    index_path = shard_index_path(file_path)
+    index = json_io.read_json(index_path)
+    if not 0 <= shard < len(index["shards"]):
+        raise ValueError(f"{index_path} has {len(index['shards'])} shards, there is no shard {shard}")
+    return os.path.join(os.path.dirname(index_path), index["shards"][shard]["file"])
+
+
+class ShardedWriter:
+    """
+    Split records over `shards` files by a stable hash of `record[key]`, so
+    records sharing a key always land in the same shard, in their original
+    order, and each shard can be uploaded independently.
+
+    `file_path` is the index written on close. It lists every shard file
+    with its record count and the keys it holds.
+    """
+
+    def __init__(self, file_path, output_format, shards, key, compression="none", index_fields=None):
+        extension, writer_class = OUTPUT_FORMATS[output_format]
+        extension += COMPRESSIONS[compression]
+        base = file_path[:-len(SHARD_INDEX_SUFFIX)] if file_path.endswith(SHARD_INDEX_SUFFIX) else file_path
+        self.file_path = file_path
+        self.key = key
+        self.count = 0
+        self._extension = extension
+        self._base = base
+        self._writers = [
+            writer_class(f"{base}.shard{i:02d}{extension}", compression, index_fields) for i in range(shards)
+        ]
+        self._keys = [{} for _ in range(shards)]
+
+    def __enter__(self):
+        for writer in self._writers:
+            writer.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, record):
+        key = record.get(self.key, "") if self.key else ""
+        shard = shard_of(key, len(self._writers))
+        self._writers[shard].write(record)
+        self._keys[shard][key] = None
+        self.count += 1
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def close(self):
+        for writer in self._writers:
+            writer.close()
+        shard_names = [os.path.basename(writer.file_path) for writer in self._writers]
+        index = {
+            "shard_key": self.key,
+            "shards": [
+                {"file": name, "records": writer.count, "keys": list(keys)}
+                for name, writer, keys in zip(shard_names, self._writers, self._keys)
+            ],
+        }
+        tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+        json_io.write_json(tmp_path, index)
+        os.replace(tmp_path, self.file_path)
+
+        # shards left over from a run with a larger shard count
+        pattern = f"{glob.escape(self._base)}.shard[0-9][0-9]{self._extension}"
+        for path in glob.glob(pattern):
+            if os.path.basename(path) not in shard_names:
+                os.remove(path)
+                if os.path.exists(path + OFFSET_INDEX_SUFFIX):
+                    os.remove(path + OFFSET_INDEX_SUFFIX)
+
+    def discard(self):
+        for writer in self._writers:
+            writer.discard()
+
+
+def open_writer(file_path, output_format="json", shards=1, shard_key=None, compression="none",
+                offset_index=False, index_fields=()):
+    """
+    Writer for one sheet's output. `shard_key` and `index_fields` name record
+    fields; the offset index is only written when `offset_index` is set.
+    """
+    index_fields = list(index_fields) if offset_index else None
+    if shards > 1:
+        return ShardedWriter(file_path, output_format, shards, shard_key, compression, index_fields)
+    _, writer_class = OUTPUT_FORMATS[output_format]
+    return writer_class(file_path, compression, index_fields)
+
+
+def iter_json_lines(file_path):
+    """Read a JSON Lines file, compressed or not, back one record at a time."""
+    with open_text(file_path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json_io.loads(line)
+
+
+def iter_json_array(file_path):
+    """
+    Read a JSON array file, compressed or not, one record at a time.
+
+    Compact files from JsonArrayWriter hold one record per line and are never
+    held in memory whole. Other layouts, such as pretty output, are parsed
+    as one document.
+    """
+    with open_text(file_path, "r") as f:
+        head = f.readline()
+        if head.rstrip("\n") != "[":
+            yield from json_io.loads(head + f.read())
+            return
+        for line in f:
+            line = line.rstrip("\n")
+            if line == "]":
+                return
+            if line[:1] != "{":
+                yield from json_io.loads("[\n" + line + "\n" + f.read())
+                return
+            yield json_io.loads(line[:-1] if line.endswith(",") else line)
+
+
+def iter_output_records(file_path):
+    """Records of an output file in any of the OUTPUT_FORMATS and COMPRESSIONS."""
+    if _strip_suffixes(file_path) + ".jsonl" + COMPRESSIONS[compression_of(file_path)] == file_path:
+        return iter_json_lines(file_path)
+    return iter_json_array(file_path)
+
+
+def find_output_file(file_path):
+    """
+    The existing output for the nominal `file_path` (e.g. "<name>.json"),
+    which may have been written as JSON Lines or compressed. The newest one
+    wins when several exist. None if there is none.
+    """
+    base = _strip_suffixes(file_path)
+    candidates = [
+        base + extension + suffix
+        for extension, _ in OUTPUT_FORMATS.values() for suffix in COMPRESSIONS.values()
+        if os.path.exists(base + extension + suffix)
+    ]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+class OffsetIndex:
+    """
+    Random access to the records of an output file through its `.idx`
+    sidecar, e.g. to re-send one failed invoice without reading the rest.
+
+        index = OffsetIndex("data/output/Migration_template_AR_Invoice.json")
+        records = index.lookup(legal_entity="LE01", invoice_number="INV-1")
+
+    Lookups by a list-valued field such as row_number match any element.
+    Offsets are into the uncompressed stream, so for compressed outputs a
+    seek still decompresses everything before the record.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.entries = list(iter_json_lines(file_path + OFFSET_INDEX_SUFFIX))
+        self._maps = {}
+
+    def _build(self, names):
+        mapping = {}
+        for entry in self.entries:
+            values = [entry.get(name) for name in names]
+            for key in itertools.product(*(v if isinstance(v, list) else [v] for v in values)):
+                mapping.setdefault(key, []).append(entry)
+        return mapping
+
+    def find(self, **fields):
+        """Index entries whose fields equal `fields`, in file order."""
+        names = tuple(sorted(fields))
+        if names not in self._maps:
+            self._maps[names] = self._build(names)
+        return self._maps[names].get(tuple(fields[name] for name in names), [])
+
+    def read(self, entries):
+        """The records of `entries`, read in file order with one seek each."""
+        with open_binary(self.file_path, "r") as f:
+            for entry in sorted(entries, key=lambda e: e["offset"]):
+                f.seek(entry["offset"])
+                yield json_io.loads(f.read(entry["length"]))
+
+    def lookup(self, **fields):
+        return list(self.read(self.find(**fields)))
+
+    def lookup_rows(self, rows):
+        """Records built from any of the sheet rows `rows`, each once."""
+        entries = {}
+        for row in rows:
+            for entry in self.find(row_number=row):
+                entries[entry["offset"]] = entry
+        return self.read(entries.values())
+
+
+def iter_records_for_rows(file_path, rows):
+    """
+    Records of an output built from any of the sheet rows `rows`, read
+    through the offset index when there is one and by a full scan otherwise.
+    """
+    if os.path.exists(file_path + OFFSET_INDEX_SUFFIX):
+        yield from OffsetIndex(file_path).lookup_rows(rows)
+        return
+    wanted = set(rows)
+    for record in iter_output_records(file_path):
+        row_number = record.get("row_number")
+        row_numbers = row_number if isinstance(row_number, list) else [row_number]
+        if wanted.intersection(row_numbers):
+            yield record
@@ -0,0 +1,128 @@
+"""
+Per-document content hashes of an output, so that a diff run writes only the
+documents that were added or changed since the previous run.
+
+Next to every output the snapshot of its last run is kept:
+
+    <base>.snapshot.json   {"key_fields": [...], "documents": [[*key, hash], ...]}
+    <base>.removed.json    key fields of the documents gone since the run before
+
+Documents are identified by the parser's `document_key` record fields; a key
+that occurs several times in a sheet is told apart by its occurrence. The
+hash covers the payload without its validationUUIDs, which are new on every
+run unless they are deterministic, so row moves and UUIDs never count as a
+change while any edit of content, configuration or generator does.
+"""
+import os
+import re
+import json
+import hashlib
+from utils import json_io
+from utils.logger import get_logger
+from utils.output_writer import sidecar_path
+
+logger = get_logger()
+
+SNAPSHOT_SUFFIX = ".snapshot.json"
+REMOVED_SUFFIX = ".removed.json"
+
+_UUID_FIELD = re.compile(rb'"validationUUID":"[^"]*"')
+
+
+def document_hash(payload):
+    """Hash of a payload, or of its compact JSON bytes (see output_writer.EncodedRecord)."""
+    if isinstance(payload, bytes):
+        payload = json_io.loads(payload)
+    # hashes use the stdlib encoder so that they do not depend on the json_io backend
+    data = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=True).encode()
+    return hashlib.blake2b(_UUID_FIELD.sub(b"", data), digest_size=16).hexdigest()
+
+
+def _occurrences(keys):
+    """(key, n) for the n-th occurrence of every key, in order."""
+    seen = {}
+    for key in keys:
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        yield key, n
+
+
+class DocumentDiff:
+    """
+    Filter of the records written to `output_file` against its snapshot.
+
+        diff = DocumentDiff(output_file, parser_class.document_key)
+        writer.write_all(diff.filter(parser.iter_parse()))
+        diff.save()
+
+    Without a usable snapshot (first run, other key fields) every record is
+    passed through and counted as added.
+    """
+
+    def __init__(self, output_file, key_fields):
+        self.key_fields = list(key_fields)
+        self.snapshot_path = sidecar_path(output_file, SNAPSHOT_SUFFIX)
+        self.removed_path = sidecar_path(output_file, REMOVED_SUFFIX)
+        self.previous = self._load()
+        self.hashes = {}
+        self._seen = {}
+        self.counts = {"added": 0, "changed": 0, "unchanged": 0}
+
+    def _load(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            snapshot = json_io.read_json(self.snapshot_path)
+        except json_io.JSONDecodeError:
+            logger.warning(f"Ignoring corrupt snapshot: {self.snapshot_path}")
+            return None
+        if snapshot.get("key_fields") != self.key_fields:
+            logger.warning(f"Snapshot {self.snapshot_path} uses other key fields, writing every document")
+            return None
+        documents = snapshot.get("documents", [])
+        keys = (tuple(entry[:-1]) for entry in documents)
+        return {key: entry[-1] for key, entry in zip(_occurrences(keys), documents)}
+
+    def filter(self, records):
+        """Yield the records that are new or differ from the snapshot, hashing all of them."""
+        for record in records:
+            values = tuple(record.get(field, "") for field in self.key_fields)
+            n = self._seen.get(values, 0)
+            self._seen[values] = n + 1
+
+            digest = document_hash(record["payload"])
+            self.hashes[(values, n)] = digest
+            previous = None if self.previous is None else self.previous.get((values, n))
+            if previous is None:
+                self.counts["added"] += 1
+            elif previous != digest:
+                self.counts["changed"] += 1
+            else:
+                self.counts["unchanged"] += 1
+                continue
+            yield record
+
+    def removed(self):
+        if not self.previous:
+            return []
+        return [
+            dict(zip(self.key_fields, values))
+            for values, n in self.previous if (values, n) not in self.hashes
+        ]
+
+    def save(self):
+        """Store the snapshot of this run and the documents removed since the previous one."""
+        removed = self.removed()
+        documents = [[*values, digest] for (values, _), digest in self.hashes.items()]
+        for path, obj in (
+            (self.snapshot_path, {"key_fields": self.key_fields, "documents": documents}),
+            (self.removed_path, removed),
+        ):
+            tmp_path = path + ".tmp"
+            json_io.write_json(tmp_path, obj)
+            os.replace(tmp_path, path)
+
+        logger.info(
+            f"Diff against previous run: {self.counts['added']} added, {self.counts['changed']} changed, "
+            f"{self.counts['unchanged']} unchanged, {len(removed)} removed"
+        )
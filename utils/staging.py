@@ -0,0 +1,155 @@
+import os
+import hashlib
+from utils.lazy_import import lazy_import
+from utils.logger import get_logger
+from utils import json_io
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+# pyarrow is optional, fall back to pickled frames
+pa = lazy_import("pyarrow", optional=True)
+pq = lazy_import("pyarrow.parquet", optional=True)
+
+logger = get_logger()
+
+_file_hashes = {}
+
+
+def file_hash(file_path):
+    """SHA-256 of a file's content, memoized per (path, size, mtime) in this process."""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _file_hashes[memo_key] = digest.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def _sheet_schema(columns):
+    return pa.schema([(c, pa.int64() if c == "row_number" else pa.string()) for c in columns])
+
+
+def _restore_missing(df):
+    """Parquet hands missing strings back as None; the parsers expect NaN."""
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+class SheetCache:
+    """
+    Columnar staging area for ingested sheets.
+
+    Every sheet is stored once per workbook content hash and reader (the
+    loader function, e.g. read_sheet or iter_sheet_chunks), as Parquet when
+    pyarrow is installed and as a pickled DataFrame otherwise:
+
+        <cache_dir>/<workbook sha256>/<reader>/<sheet name>.parquet
+        <cache_dir>/<workbook sha256>/_sheets.json
+
+    Keying by reader keeps a run from being served what another reader
+    staged, should their results ever differ.
+
+    Entries are written to a temporary file and renamed, so a crashed run
+    never leaves a partial sheet behind.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.extension = ".parquet" if pq else ".pkl"
+
+    def _workbook_dir(self, file_path):
+        return os.path.join(self.cache_dir, file_hash(file_path))
+
+    def _sheet_path(self, file_path, sheet_name, loader):
+        return os.path.join(self._workbook_dir(file_path), loader.__name__, sheet_name + self.extension)
+
+    def sheet_names(self, file_path, loader):
+        """Return the workbook's sheet names, calling `loader(file_path)` on a miss."""
+        path = os.path.join(self._workbook_dir(file_path), "_sheets.json")
+        if os.path.exists(path):
+            return json_io.read_json(path)
+
+        names = loader(file_path)
+        self._write_atomic(path, lambda tmp: json_io.write_json(tmp, names))
+        return names
+
+    def load(self, file_path, sheet_name, loader):
+        """Return the staged sheet, calling `loader(file_path, sheet_name)` on a miss."""
+        path = self._sheet_path(file_path, sheet_name, loader)
+        if os.path.exists(path):
+            logger.info(f"Loading staged sheet: {path}")
+            return self._read(path)
+
+        df = loader(file_path, sheet_name)
+        try:
+            self._write_atomic(path, lambda tmp: self._write(tmp, df))
+        except Exception as e:
+            logger.warning(f"Could not stage sheet {sheet_name}: {e}")
+        return df
+
+    def iter_chunks(self, file_path, sheet_name, chunk_size, loader):
+        """
+        Stream a sheet from the cache in chunks. On a miss the chunks produced
+        by `loader(file_path, sheet_name, chunk_size)` are passed through and,
+        with pyarrow available, written to the cache as they go.
+        """
+        path = self._sheet_path(file_path, sheet_name, loader)
+        if os.path.exists(path):
+            logger.info(f"Streaming staged sheet: {path}")
+            if pq:
+                for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+                    yield _restore_missing(batch.to_pandas())
+            else:
+                df = pd.read_pickle(path)
+                for start in range(0, len(df), chunk_size):
+                    yield df.iloc[start:start + chunk_size].reset_index(drop=True)
+            return
+
+        chunks = loader(file_path, sheet_name, chunk_size)
+        if not pq:
+            yield from chunks
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        writer = None
+        completed = False
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, _sheet_schema(chunk.columns))
+                writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))
+                yield chunk
+            completed = True
+        finally:
+            if writer is not None:
+                writer.close()
+                # a consumer that stopped early would leave an incomplete copy
+                if completed:
+                    os.replace(tmp_path, path)
+                else:
+                    os.remove(tmp_path)
+
+    def _read(self, path):
+        if path.endswith(".parquet"):
+            return _restore_missing(pd.read_parquet(path))
+        return pd.read_pickle(path)
+
+    def _write(self, path, df):
+        if pq:
+            table = pa.Table.from_pandas(df, schema=_sheet_schema(df.columns), preserve_index=False)
+            pq.write_table(table, path)
+        else:
+            df.to_pickle(path)
+
+    @staticmethod
+    def _write_atomic(path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL_SECONDS = 3600
+
+
+class TTLCache:
+    """
+    Bounded mapping of key -> value where every entry expires `ttl` seconds
+    after it was stored and, once `max_entries` are held, the least recently
+    used one is evicted. A ttl of None keeps entries until they are evicted.
+
+    hits, misses and evictions count what get_or_load() saw, so callers can
+    report how many loads the cache saved.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """Whether `key` holds an unexpired value; not counted as a hit or miss."""
+        entry = self._entries.get(key)
+        return entry is not None and (entry[0] is None or entry[0] > self._clock())
+
+    def get_or_load(self, key, load):
+        """The cached value of `key`, or load() stored under it. Errors from load() are not cached."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires is None or expires > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        value = load()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        expires = None if self.ttl is None else self._clock() + self.ttl
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,142 @@
+"""
+Providers for the validationUUIDs written into the payloads.
+
+    random         uuid4 per call, one os.urandom call each
+    bulk           uuid4 values cut from large os.urandom blocks
+    deterministic  uuid5 of the document key and the position in the payload,
+                   so rerunning on the same sheet writes the same UUIDs. The
+                   key does not include the workbook or tab, so an invoice
+                   found in several sheets gets the same UUIDs in each.
+"""
+import os
+import uuid
+import hashlib
+import weakref
+from utils.config_loader import load_config
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+UUID_MODES = ("random", "bulk", "deterministic")
+DEFAULT_UUID_MODE = "bulk"
+DEFAULT_BLOCK_SIZE = 4096
+
+# Fixed namespace of the deterministic mode. Changing it changes every UUID.
+VALIDATION_NAMESPACE = uuid.UUID("6f0b1e52-8c1d-5d4e-9a57-3c2f4b7e9d10")
+
+_PART_SEPARATOR = "\x1f"
+
+
+def _format(h):
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:32]}"
+
+
+class RandomUUIDs:
+    """uuid.uuid4() for every UUID, as the generators always did."""
+
+    content_derived = False
+
+    def new(self):
+        return str(uuid.uuid4())
+
+
+class BulkRandomUUIDs:
+    """
+    Version 4 UUIDs drawn from one os.urandom call per `block_size` UUIDs.
+
+    The pool is dropped in forked children so that two processes never
+    hand out the same values.
+    """
+
+    content_derived = False
+
+    def __init__(self, block_size=DEFAULT_BLOCK_SIZE):
+        self.block_size = block_size
+        self._pool = []
+        _bulk_providers.add(self)
+
+    def _refill(self):
+        raw = np.frombuffer(os.urandom(16 * self.block_size), dtype=np.uint8).reshape(-1, 16).copy()
+        raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+        raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+        h = raw.tobytes().hex()
+        self._pool = [_format(h[i:i + 32]) for i in range(0, len(h), 32)]
+
+    def new(self):
+        if not self._pool:
+            self._refill()
+        return self._pool.pop()
+
+
+class DeterministicUUIDs:
+    """
+    Version 5 UUIDs derived from the parts passed to `derive`, joined with
+    the ASCII unit separator. derive(*parts) equals
+    str(uuid.uuid5(namespace, "\\x1f".join(parts))).
+    """
+
+    content_derived = True
+
+    def __init__(self, namespace=VALIDATION_NAMESPACE):
+        self.namespace = namespace
+        self._prefix = namespace.bytes
+
+    def derive(self, *parts):
+        digest = bytearray(hashlib.sha1(self._prefix + _PART_SEPARATOR.join(parts).encode()).digest())
+        digest[6] = (digest[6] & 0x0F) | 0x50  # version 5
+        digest[8] = (digest[8] & 0x3F) | 0x80  # RFC 4122 variant
+        return _format(digest.hex())
+
+    def new(self):
+        raise ValueError("Deterministic UUIDs are derived from the document, use derive()")
+
+
+_bulk_providers = weakref.WeakSet()
+
+
+def _drop_bulk_pools():
+    for provider in list(_bulk_providers):
+        provider._pool = []
+
+
+os.register_at_fork(after_in_child=_drop_bulk_pools)
+
+_PROVIDERS = {
+    "random": RandomUUIDs,
+    "bulk": BulkRandomUUIDs,
+    "deterministic": DeterministicUUIDs,
+}
+
+_provider = None
+
+
+def make_uuid_provider(mode):
+    if mode not in _PROVIDERS:
+        raise ValueError(f"Unknown UUID mode: {mode} (expected one of {', '.join(UUID_MODES)})")
+    return _PROVIDERS[mode]()
+
+
+def configured_uuid_mode():
+    return load_config().get("uuid", {}).get("mode", DEFAULT_UUID_MODE)
+
+
+def configure_uuids(mode=None):
+    """Select the provider returned by get_uuid_provider(); None means the configured mode."""
+    global _provider
+    mode = mode or configured_uuid_mode()
+    # keep the current provider, and its pool, when the mode does not change
+    if _provider is None or type(_provider) is not _PROVIDERS.get(mode):
+        _provider = make_uuid_provider(mode)
+    return _provider
+
+
+def current_uuid_mode():
+    """Mode of the provider returned by get_uuid_provider()."""
+    provider_class = type(get_uuid_provider())
+    return next(mode for mode, cls in _PROVIDERS.items() if cls is provider_class)
+
+
+def get_uuid_provider():
+    if _provider is None:
+        configure_uuids()
+    return _provider